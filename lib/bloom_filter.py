@@ -0,0 +1,138 @@
+"""
+bloom_filter.py
+
+Fixed-size Bloom filter of card UIDs. The admin board builds it from its card
+index and sends it to the readers in chunks, so they can still let known
+cards in while the admin board is out of reach.
+
+A Bloom filter never misses a card that was added, but may accept a few cards
+that were not (about 0.3% with the defaults and 2000 cards). Cards can not be
+removed, so the admin rebuilds the filter and sends only the chunks that
+changed.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+from card_index import UID_SIZE
+
+CHUNK_SIZE = 128  # Filter bytes per ESP-NOW frame
+
+
+def _hash(uid, seed):
+    # FNV-1a kept to 20 bits, so it never leaves MicroPython's small int range
+    h = seed
+    for i in range(UID_SIZE):
+        h = ((h ^ uid[i]) * 0x193) & 0xFFFFF
+    return h
+
+
+class BloomFilter:
+    """
+    Bloom filter over 4 byte UIDs.
+
+    Attributes:
+        size (int): Filter size in bytes, a multiple of CHUNK_SIZE.
+        hashes (int): Bits set per UID.
+        bits (bytearray): The filter.
+        dirty (bool): True if the filter changed since it was last saved.
+    """
+
+    def __init__(self, size=4096, hashes=4):
+        """
+        Initializes an empty filter.
+
+        Args:
+            size (int): Filter size in bytes.
+            hashes (int): Bits set per UID.
+        """
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray(size)
+        self.dirty = False
+        self._nbits = size * 8
+
+    def _positions(self, uid):
+        h1 = _hash(uid, 0x9DC5)
+        h2 = _hash(uid, 0x5BD1) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self._nbits
+
+    def add(self, uid):
+        for bit in self._positions(uid):
+            self.bits[bit >> 3] |= 1 << (bit & 7)
+        self.dirty = True
+
+    def might_contain(self, uid):
+        """
+        Returns False if the UID was never added, True if it probably was.
+        """
+        if len(uid) < UID_SIZE:
+            return False
+        for bit in self._positions(uid):
+            if not self.bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def clear(self):
+        for i in range(self.size):
+            self.bits[i] = 0
+        self.dirty = True
+
+    @property
+    def chunk_count(self):
+        return self.size // CHUNK_SIZE
+
+    def chunk(self, index):
+        """
+        Returns one chunk of the filter as a view, for sending.
+        """
+        return memoryview(self.bits)[index * CHUNK_SIZE : (index + 1) * CHUNK_SIZE]
+
+    def write_chunk(self, index, data):
+        """
+        Replaces one chunk of the filter with a chunk received from the admin board.
+        """
+        if index >= self.chunk_count or len(data) != CHUNK_SIZE:
+            return
+        memoryview(self.bits)[index * CHUNK_SIZE : (index + 1) * CHUNK_SIZE] = data
+        self.dirty = True
+
+    def changed_chunks(self, other):
+        """
+        Returns the indexes of the chunks that differ from another filter of the same size.
+        """
+        changed = []
+        mine, theirs = self.bits, other.bits
+        for index in range(self.chunk_count):
+            for i in range(index * CHUNK_SIZE, (index + 1) * CHUNK_SIZE):
+                if mine[i] != theirs[i]:
+                    changed.append(index)
+                    break
+        return changed
+
+    def load(self, path):
+        """
+        Loads a filter saved with save().
+
+        Returns:
+            bool: False if the file is missing or has the wrong size.
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.readinto(self.bits) != self.size:
+                    self.clear()
+                    return False
+        except OSError:
+            return False
+        self.dirty = False
+        return True
+
+    def save(self, path):
+        try:
+            with open(path, "wb") as f:
+                f.write(self.bits)
+        except OSError as e:
+            print(f"[Bloom] Failed to save {path}: {e}")
+            return
+        self.dirty = False
@@ -4,6 +4,9 @@ MicroPython Switch Debounce Using time.ticks_ms()
 This module implements a debounced switch input using an IRQ pin without using a Timer.
 The debounce logic is handled via a time-based approach, ensuring stable switch presses.
 
+DebounceGroup debounces several inputs from one periodic tick instead, using an
+integrator per pin, and reports both rising and falling edges without sleeping.
+
 Author: Allan Bernard Chan
 Date: March 2025
 """
@@ -66,6 +69,127 @@ class PinDebounce:
         self.pin.irq(trigger=Pin.IRQ_RISING, handler=self.irq_handler)  # Enable IRQ
 
 
+class DebounceGroup:
+    """
+    Debounces a group of pins from one periodic tick instead of one IRQ per pin.
+
+    Every pin has an integrator that counts up while the pin reads HIGH and down
+    while it reads LOW. The debounced level only changes when the integrator
+    reaches `threshold` or 0, so a glitch has to last `threshold` samples to be
+    seen. Nothing sleeps and no pin IRQ is used; call sample() from a Timer or task.
+
+    Attributes:
+        threshold (int): Number of consistent samples needed to change a debounced level.
+    """
+
+    def __init__(self, threshold=3):
+        """
+        Initializes an empty group.
+
+        Args:
+            threshold (int): Number of consistent samples needed to change a debounced level.
+        """
+        self.threshold = threshold
+        self.pins = []
+        self._counts = bytearray(0)
+        self._levels = bytearray(0)
+        self._enabled = bytearray(0)
+        self._last_rise = []
+        self._debounce_times = []
+        self._on_rise = []
+        self._on_fall = []
+
+    def add(self, pin_number, callback=None, debounce_time=0, on_fall=None):
+        """
+        Adds a pin to the group. Reporting starts disabled, like PinDebounce.
+
+        Args:
+            pin_number (int): The GPIO pin number.
+            callback (function): Function to call on a debounced rising edge.
+            debounce_time (int): Minimum time between two reported rising edges (in ms).
+            on_fall (function): Function to call on a debounced falling edge.
+        Returns:
+            DebouncedPin: Handle with the same enable_irq()/disable_irq() interface as PinDebounce.
+        """
+        pin = Pin(pin_number, Pin.IN)  # Using external pull-down
+        level = pin.value()
+        self.pins.append(pin)
+        self._counts += bytes((self.threshold if level else 0,))
+        self._levels += bytes((level,))
+        self._enabled += b"\x00"
+        self._last_rise.append(time.ticks_add(time.ticks_ms(), -debounce_time - 1))
+        self._debounce_times.append(debounce_time)
+        self._on_rise.append(callback)
+        self._on_fall.append(on_fall)
+        return DebouncedPin(self, len(self.pins) - 1)
+
+    def sample(self, timer=None):
+        """
+        Samples every pin once and reports the debounced edges of the enabled pins.
+
+        Args:
+            timer: Unused, lets sample() be passed directly as a Timer callback.
+        """
+        counts = self._counts
+        threshold = self.threshold
+        for i in range(len(self.pins)):
+            count = counts[i]
+            if self.pins[i].value():
+                if count < threshold:
+                    count += 1
+                    counts[i] = count
+                    if count == threshold and not self._levels[i]:
+                        self._levels[i] = 1
+                        self._rising(i)
+            elif count > 0:
+                count -= 1
+                counts[i] = count
+                if count == 0 and self._levels[i]:
+                    self._levels[i] = 0
+                    if self._enabled[i] and self._on_fall[i] is not None:
+                        self._on_fall[i]()
+
+    def _rising(self, i):
+        if not self._enabled[i] or self._on_rise[i] is None:
+            return
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self._last_rise[i]) > self._debounce_times[i]:
+            self._last_rise[i] = now
+            self._on_rise[i]()
+
+
+class DebouncedPin:
+    """
+    One pin of a DebounceGroup.
+
+    Attributes:
+        pin (Pin): GPIO pin of the input.
+    """
+
+    def __init__(self, group, index):
+        self.group = group
+        self.index = index
+        self.pin = group.pins[index]
+
+    def value(self):
+        """
+        Returns the debounced level of the pin.
+        """
+        return self.group._levels[self.index]
+
+    def disable_irq(self):
+        """
+        Stops reporting edges of this pin. The pin is still sampled.
+        """
+        self.group._enabled[self.index] = 0
+
+    def enable_irq(self):
+        """
+        Starts reporting edges of this pin again.
+        """
+        self.group._enabled[self.index] = 1
+
+
 if __name__ == "__main__":
 
     def switch_pressed():
@@ -0,0 +1,158 @@
+"""
+card_index.py
+
+Card allowlist stored on flash as a sorted array of fixed-width UIDs. Lookups
+binary search the file with seek() and small reads into one preallocated
+buffer, so thousands of cards can be checked without loading them into the
+heap. MicroPython has no mmap, so the last few steps of the search are done on
+one chunk read into memory instead.
+
+File layout: UID_SIZE bytes per card, sorted in ascending byte order, no
+duplicates and no header.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+UID_SIZE = 4  # The MFRC522 anticollision also returns a check byte, it is not stored
+
+
+def _compare(buf, offset, key):
+    """
+    Compares the UID at buf[offset:] with key without slicing.
+
+    Returns:
+        int: Negative, 0 or positive like a cmp() function.
+    """
+    for i in range(UID_SIZE):
+        diff = buf[offset + i] - key[i]
+        if diff:
+            return diff
+    return 0
+
+
+class CardIndex:
+    """
+    Read-only view of a card index file.
+
+    Attributes:
+        path (str): Index file.
+        count (int): Number of cards in the file.
+    """
+
+    def __init__(self, path="cards.bin", chunk_cards=32):
+        """
+        Opens the index. A missing file is an empty allowlist.
+
+        Args:
+            path (str): Index file.
+            chunk_cards (int): Cards read at once for the final in-memory search.
+        """
+        self.path = path
+        self.chunk_cards = chunk_cards
+        self._buf = bytearray(chunk_cards * UID_SIZE)
+        self._view = memoryview(self._buf)
+        self._file = None
+        self.count = 0
+        self.reload()
+
+    def reload(self):
+        """
+        Reopens the file, e.g. after it was rebuilt.
+        """
+        self.close()
+        try:
+            self._file = open(self.path, "rb")
+        except OSError:
+            print(f"[Cards] No index at {self.path}, every card is denied")
+            self.count = 0
+            return
+        self._file.seek(0, 2)
+        self.count = self._file.tell() // UID_SIZE
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return self.count
+
+    def uids(self):
+        """
+        Yields every UID in order, reading the file one buffer at a time.
+
+        Each UID is a view into the read buffer, only valid until the next one is yielded.
+        """
+        if self._file is None:
+            return
+        f = self._file
+        f.seek(0)
+        remaining = self.count
+        while remaining:
+            n = min(remaining, self.chunk_cards)
+            f.readinto(self._view[: n * UID_SIZE])
+            for i in range(n):
+                yield self._view[i * UID_SIZE : (i + 1) * UID_SIZE]
+            remaining -= n
+
+    def contains(self, uid):
+        """
+        Looks a card up in O(log n) seeks.
+
+        Args:
+            uid (bytes): Card UID, only the first UID_SIZE bytes are used.
+        Returns:
+            bool: True if the card is in the allowlist.
+        """
+        if len(uid) < UID_SIZE or self._file is None:
+            return False
+        f = self._file
+        record = self._view[:UID_SIZE]
+        low, high = 0, self.count
+        # Narrow the range one record read at a time until it fits in the buffer
+        while high - low > self.chunk_cards:
+            middle = (low + high) // 2
+            f.seek(middle * UID_SIZE)
+            f.readinto(record)
+            diff = _compare(self._buf, 0, uid)
+            if diff == 0:
+                return True
+            if diff < 0:
+                low = middle + 1
+            else:
+                high = middle
+        # Then search the remaining records in memory
+        f.seek(low * UID_SIZE)
+        f.readinto(self._view[: (high - low) * UID_SIZE])
+        low_i, high_i = 0, high - low
+        while low_i < high_i:
+            middle = (low_i + high_i) // 2
+            diff = _compare(self._buf, middle * UID_SIZE, uid)
+            if diff == 0:
+                return True
+            if diff < 0:
+                low_i = middle + 1
+            else:
+                high_i = middle
+        return False
+
+
+def build(path, uids):
+    """
+    Writes an index file from any iterable of UIDs, sorting them and dropping duplicates.
+
+    This holds every UID in memory, so build large indexes on the host and copy
+    the file to the board.
+
+    Args:
+        path (str): Index file to write.
+        uids (iterable): Card UIDs as bytes. Only the first UID_SIZE bytes are used.
+    Returns:
+        int: Number of cards written.
+    """
+    cards = sorted(set(bytes(uid[:UID_SIZE]) for uid in uids if len(uid) >= UID_SIZE))
+    with open(path, "wb") as f:
+        for uid in cards:
+            f.write(uid)
+    return len(cards)
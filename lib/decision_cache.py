@@ -0,0 +1,127 @@
+"""
+decision_cache.py
+
+Small LRU cache of recent grant/deny decisions, kept on each reader so a card
+that was checked recently does not have to wait for the admin board round trip.
+Entries expire after a TTL and the admin board can invalidate them with an
+OP_CACHE_INVALIDATE broadcast.
+
+All entries live in preallocated arrays, so lookups and updates do not allocate.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import time
+
+from card_index import UID_SIZE
+
+
+class DecisionCache:
+    """
+    Bounded LRU cache of card decisions.
+
+    Attributes:
+        size (int): Number of cards remembered.
+        grant_ttl_ms (int): Lifetime of a grant in ms.
+        deny_ttl_ms (int): Lifetime of a denial in ms, shorter so newly added cards are picked up quickly.
+        hits (int): Number of lookups answered from the cache.
+    """
+
+    def __init__(self, size=32, grant_ttl_ms=3600000, deny_ttl_ms=60000):
+        """
+        Initializes the cache.
+
+        Args:
+            size (int): Number of cards to remember.
+            grant_ttl_ms (int): Lifetime of a grant in ms.
+            deny_ttl_ms (int): Lifetime of a denial in ms.
+        """
+        self.size = size
+        self.grant_ttl_ms = grant_ttl_ms
+        self.deny_ttl_ms = deny_ttl_ms
+        self.hits = 0
+        self._uids = bytearray(size * UID_SIZE)
+        self._valid = bytearray(size)
+        self._granted = bytearray(size)
+        self._expires = [0] * size
+        self._used = [0] * size
+        self._clock = 0  # Use counter, the smallest _used entry is the least recently used
+
+    def _find(self, uid):
+        uids = self._uids
+        for i in range(self.size):
+            if not self._valid[i]:
+                continue
+            offset = i * UID_SIZE
+            for j in range(UID_SIZE):
+                if uids[offset + j] != uid[j]:
+                    break
+            else:
+                return i
+        return -1
+
+    def get(self, uid):
+        """
+        Looks a card up.
+
+        Args:
+            uid (bytes): Card UID, only the first UID_SIZE bytes are used.
+        Returns:
+            bool: The cached decision, or None if the card is not cached or the entry expired.
+        """
+        i = self._find(uid)
+        if i < 0:
+            return None
+        if time.ticks_diff(self._expires[i], time.ticks_ms()) <= 0:
+            self._valid[i] = 0
+            return None
+        self._clock += 1
+        self._used[i] = self._clock
+        self.hits += 1
+        return self._granted[i] == 1
+
+    def put(self, uid, granted):
+        """
+        Stores a decision, replacing the least recently used entry when full.
+
+        Args:
+            uid (bytes): Card UID.
+            granted (bool): Decision of the admin board.
+        """
+        if len(uid) < UID_SIZE:
+            return
+        i = self._find(uid)
+        if i < 0:
+            i = 0
+            for j in range(self.size):
+                if not self._valid[j]:
+                    i = j
+                    break
+                if self._used[j] < self._used[i]:
+                    i = j
+            offset = i * UID_SIZE
+            for j in range(UID_SIZE):
+                self._uids[offset + j] = uid[j]
+            self._valid[i] = 1
+        self._granted[i] = 1 if granted else 0
+        ttl = self.grant_ttl_ms if granted else self.deny_ttl_ms
+        self._expires[i] = time.ticks_add(time.ticks_ms(), ttl)
+        self._clock += 1
+        self._used[i] = self._clock
+
+    def invalidate(self, uids=b""):
+        """
+        Drops cached decisions.
+
+        Args:
+            uids (bytes): Concatenated UIDs to drop, or empty to drop every entry.
+        """
+        if len(uids) < UID_SIZE:
+            for i in range(self.size):
+                self._valid[i] = 0
+            return
+        for offset in range(0, len(uids) - UID_SIZE + 1, UID_SIZE):
+            i = self._find(uids[offset : offset + UID_SIZE])
+            if i >= 0:
+                self._valid[i] = 0
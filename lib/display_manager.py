@@ -1,23 +1,214 @@
 """
 SSD1306 OLED display manager.
+
+The driver only sends the columns that changed since the last frame. With
+diff=True, show_lines also only redraws the lines whose text changed.
+
+Screens can also be posted to a scheduler instead of being drawn and slept on.
+A posted screen stays up for its hold time, then the next queued screen is
+shown, or the idle screen once the queue is empty. A screen with a priority at
+least as high as the one on display replaces it at once. The scheduler runs
+from service(), which is called between card probes, from a Timer (start), or
+from an asyncio task (run), so the board keeps scanning while a result is shown.
+
+Screens that are shown over and over can be rendered once with prerender() and
+shown by name: the cached frame is copied into the framebuffer in one go, no
+text is drawn. Cached screens can use a scaled font, e.g. to be read from a car.
 """
 
+from machine import Timer  # type: ignore
 from ssd1306 import SSD1306_I2C
+import framebuf
 import time
 
+FAST_MODE = 400000  # I2C clock of the SSD1306 fast mode in Hz, pass it when the bus is built
+LINE_HEIGHT = 10  # Pixel rows per line of text, glyphs are 8 high
+SERVICE_PERIOD = 50  # Time between two scheduler runs from start() or run(), in ms
+MAX_QUEUED = 4  # Screens waiting behind the one on display
+
 class DisplayManager:
-    def __init__(self, i2c, width=128, height=64):
+    def __init__(self, i2c, width=128, height=64, diff=True):
         self.oled = SSD1306_I2C(width, height, i2c)
+        self.width = width
+        self.height = height
+        self._screens = {}  # Name -> pre-rendered frame
+        self.diff = diff
+        self._lines = None  # Lines on screen, None if the screen holds anything else
+        self._idle = None  # Lines shown when nothing is posted
+        self._queue = []  # [lines, hold_ms, priority, expires_at] waiting to be shown
+        self._current = None  # Posted screen on display, None for the idle screen
+        self._until = 0  # ticks_ms at which the current screen may be replaced
+        self._timer = None
 
     def show_message(self, message, duration=2):
-        self.oled.fill(0)
-        self.oled.text(message, 0, 0)
-        self.oled.show()
-        time.sleep(duration)
+        """
+        Shows a single line for duration seconds, without blocking.
+        """
+        self.post([message], hold_ms=int(duration * 1000))
 
     def show_lines(self, lines, clear=True):
-        if clear:
-            self.oled.fill(0)
+        if clear and self.diff and self._lines is not None:
+            self._redraw_changed(lines)
+        else:
+            if clear:
+                self.oled.fill(0)
+            for idx, line in enumerate(lines):
+                self.oled.text(line, 0, idx * LINE_HEIGHT)
+        self._lines = list(lines) if clear else None
+        self.oled.show()
+
+    def _redraw_changed(self, lines):
+        old = self._lines
+        for idx in range(max(len(lines), len(old))):
+            line = lines[idx] if idx < len(lines) else None
+            if idx < len(old) and old[idx] == line:
+                continue
+            self.oled.fill_rect(0, idx * LINE_HEIGHT, self.width, LINE_HEIGHT, 0)
+            if line is not None:
+                self.oled.text(line, 0, idx * LINE_HEIGHT)
+
+    def prerender(self, name, lines, scale=1, center=False):
+        """
+        Renders a screen once and keeps the frame for show_screen(name).
+
+        Args:
+            name (str): Name of the screen.
+            lines (list): Lines of text.
+            scale (int): Font scale, 2 gives 16 px high glyphs (8 characters per line).
+            center (bool): Center each line horizontally.
+        """
+        frame = bytearray(len(self.oled.buffer))
+        fb = framebuf.FrameBuffer(frame, self.width, self.height, framebuf.MONO_VLSB)
+        glyph = None
+        if scale > 1:
+            # One glyph at a time is drawn at 8x8, then copied as scale x scale blocks
+            glyph = framebuf.FrameBuffer(bytearray(8), 8, 8, framebuf.MONO_VLSB)
         for idx, line in enumerate(lines):
-            self.oled.text(line, 0, idx * 10)
+            y = idx * LINE_HEIGHT * scale
+            x = (self.width - len(line) * 8 * scale) // 2 if center else 0
+            if glyph is None:
+                fb.text(line, max(x, 0), y)
+                continue
+            for char in line:
+                glyph.fill(0)
+                glyph.text(char, 0, 0)
+                for gy in range(8):
+                    for gx in range(8):
+                        if glyph.pixel(gx, gy):
+                            fb.fill_rect(x + gx * scale, y + gy * scale, scale, scale, 1)
+                x += 8 * scale
+        self._screens[name] = frame
+
+    def show_screen(self, name):
+        """
+        Shows a screen rendered with prerender().
+        """
+        self.oled.buffer[:] = self._screens[name]
+        self._lines = None
         self.oled.show()
+
+    def _draw(self, screen):
+        # A screen is a list of lines or the name of a pre-rendered screen
+        if isinstance(screen, str):
+            self.show_screen(screen)
+        else:
+            self.show_lines(screen)
+
+    def set_idle(self, lines):
+        """
+        Sets the screen shown whenever no posted screen is on display, and shows it if so.
+
+        Args:
+            lines: Lines of text, or the name of a pre-rendered screen.
+        """
+        self._idle = lines
+        if self._current is None:
+            self._draw(lines)
+
+    def post(self, lines, hold_ms=0, priority=0, expires_ms=None):
+        """
+        Shows a screen now, or queues it behind the one on display.
+
+        Args:
+            lines: Lines of text, or the name of a pre-rendered screen.
+            hold_ms (int): Minimum time on display before a queued screen may replace it.
+            priority (int): A screen replaces the one on display at once if its priority
+                is at least as high; otherwise it waits.
+            expires_ms (int): Optional, the screen is dropped if it waited this long in the queue.
+        """
+        now = time.ticks_ms()
+        if self._current is None or priority >= self._current[2]:
+            self._display([lines, hold_ms, priority, None], now)
+            return
+        expires_at = None if expires_ms is None else time.ticks_add(now, expires_ms)
+        if len(self._queue) >= MAX_QUEUED:
+            self._queue.pop(0)  # Oldest first
+        self._queue.append([lines, hold_ms, priority, expires_at])
+        self.service()  # The current screen may already have been up long enough
+
+    def service(self):
+        """
+        Replaces the screen on display once its hold time is over. Does not block.
+        """
+        now = time.ticks_ms()
+        if self._current is None or not self._held(now):
+            return
+        entry = self._next(now)
+        if entry is not None:
+            self._display(entry, now)
+        else:
+            self._current = None
+            if self._idle is not None:
+                self._draw(self._idle)
+
+    def _held(self, now):
+        # True once the current screen has been up for its hold time
+        return time.ticks_diff(now, self._until) >= 0
+
+    def _next(self, now):
+        # Highest priority screen that has not expired, first posted first within a priority
+        best = None
+        for entry in self._queue[:]:
+            expires_at = entry[3]
+            if expires_at is not None and time.ticks_diff(now, expires_at) >= 0:
+                self._queue.remove(entry)
+            elif best is None or entry[2] > best[2]:
+                best = entry
+        if best is not None:
+            self._queue.remove(best)
+        return best
+
+    def _display(self, entry, now):
+        self._current = entry
+        self._until = time.ticks_add(now, entry[1])
+        self._draw(entry[0])
+
+    def start(self, period_ms=SERVICE_PERIOD, timer=None):
+        """
+        Runs service() from a periodic Timer.
+
+        Args:
+            period_ms (int): Time between two runs in ms.
+            timer (Timer): Timer to use, Timer(2) if None.
+        """
+        self.stop()
+        self._timer = timer or Timer(2)
+        self._timer.init(mode=Timer.PERIODIC, period=period_ms, callback=lambda t: self.service())
+
+    def stop(self):
+        """
+        Stops the runs started by start().
+        """
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+
+    async def run(self, period_ms=SERVICE_PERIOD):
+        """
+        Runs service() forever, as an asyncio task.
+        """
+        import asyncio  # type: ignore
+
+        while True:
+            self.service()
+            await asyncio.sleep_ms(period_ms)
@@ -4,6 +4,10 @@ espnow_handler.py
 Handles ESP-NOW peer communication setup and message dispatching
 for the ESP32 boards in the gate access control system.
 
+RequestClient sends a request and waits for the reply that carries the same
+sequence number, so a late reply to an earlier request is never taken as the
+answer to the current one.
+
 Author: Allan Bernard Chan
 Date: July 2025
 """
@@ -12,6 +16,8 @@ import espnow  # type: ignore
 import network  # type: ignore
 import time
 
+from gate_protocol import Encoder, Message, parse
+
 class ESPNowHandler:
     """
     A class to manage ESP-NOW peer-to-peer messaging.
@@ -19,18 +25,22 @@ class ESPNowHandler:
     Attributes:
         peers (dict): Dictionary of known peer MACs and their roles.
     """
-    def __init__(self, wifi_interface=None):
+    def __init__(self, wifi_interface=None, rxbuf=None):
         """
         Initializes ESP-NOW and Wi-Fi interface.
 
         Args:
             wifi_interface: Optional network interface to use.
+            rxbuf (int): Optional size in bytes of the receive buffer (526 by default),
+                for boards that receive bursts of frames.
         """
         self.iface = wifi_interface or network.WLAN(network.STA_IF)
         self.iface.active(True)
         self.iface.disconnect()  # Ensure no active connections
 
         self.espnow = espnow.ESPNow()
+        if rxbuf is not None:
+            self.espnow.config(rxbuf=rxbuf)
         self.espnow.active(True)
 
         self.peers = []
@@ -84,3 +94,90 @@ class ESPNowHandler:
             return None, None
         else:
             return mac, msg
+
+
+class RequestClient:
+    """
+    Request/response client on top of an ESPNowHandler.
+
+    Attributes:
+        handler (ESPNowHandler): Handler used to send and receive.
+        encoder (Encoder): Encoder of this board, its sequence numbers are the request IDs.
+        on_frame (function): Called as on_frame(mac, message) for every received frame that is not
+            the reply being waited for, e.g. broadcasts or replies to requests sent with send().
+        stale (int): Number of replies dropped because they did not match the request.
+    """
+    def __init__(self, handler, role, on_frame=None):
+        """
+        Initializes the client.
+
+        Args:
+            handler (ESPNowHandler): Handler used to send and receive.
+            role (int): Role of this board, one of the gate_protocol ROLE_* codes.
+            on_frame (function): Optional handler for the other frames, see the class attributes.
+        """
+        self.handler = handler
+        self.encoder = Encoder(role)
+        self.on_frame = on_frame
+        self.stale = 0
+        self._reply = Message()
+
+    def send(self, mac, opcode, *parts):
+        """
+        Sends a frame without waiting for a reply, e.g. the open command.
+
+        Returns:
+            int: Sequence number of the frame. A reply to it is passed to on_frame.
+        """
+        seq = self.encoder.next_seq()
+        self.handler.send(mac, self.encoder.encode(opcode, *parts, seq=seq))
+        return seq
+
+    def poll(self):
+        """
+        Passes every frame that is waiting to on_frame, without blocking.
+        """
+        while True:
+            sender, msg = self.handler.recv(0)
+            if sender is None:
+                return
+            self._other(sender, parse(msg, self._reply))
+
+    def _other(self, sender, message):
+        if message is not None and self.on_frame is not None:
+            self.on_frame(sender, message)
+        else:
+            self.stale += 1
+
+    def request(self, mac, opcode, *parts, expect=(), timeout_ms=3000):
+        """
+        Sends a request and waits for its reply, returning as soon as it arrives.
+
+        Args:
+            mac (bytes): MAC address of the peer.
+            opcode (int): Opcode of the request.
+            parts: Payload pieces, see Encoder.encode().
+            expect (tuple): Reply opcodes accepted. Frames with another opcode, e.g. broadcasts that
+                happen to carry the same sequence number, are passed to on_frame. Frames without a
+                sequence number, from boards that still send them, are accepted on the opcode alone.
+            timeout_ms (int): Deadline for the reply in ms.
+        Returns:
+            Message: The reply, valid until the next call. None if no reply arrived in time.
+        """
+        seq = self.encoder.next_seq()
+        self.handler.send(mac, self.encoder.encode(opcode, *parts, seq=seq))
+        deadline = time.ticks_add(time.ticks_ms(), timeout_ms)
+        while True:
+            remaining = time.ticks_diff(deadline, time.ticks_ms())
+            if remaining <= 0:
+                return None
+            sender, msg = self.handler.recv(remaining)
+            if sender is None:
+                return None
+            reply = parse(msg, self._reply)
+            if reply is None:
+                self.stale += 1
+            elif reply.opcode in expect and (reply.seq == seq or not reply.version):
+                return reply
+            else:
+                self._other(sender, reply)  # Not ours, e.g. a reply to an earlier request that timed out
@@ -0,0 +1,325 @@
+"""
+espnow_relay.py
+
+Store-and-forward engine for boards that repeat ESP-NOW frames, like the
+runner board. The receive callback drains every waiting frame, copies it into
+a bounded queue of preallocated frame buffers and returns. The queue is then
+flushed with asynchronous sends, which do not wait for the peer to acknowledge
+the frame, so a burst from several readers never blocks the callback.
+
+When the queue is full the oldest frame is dropped by default: a reader that
+waited that long has already given up on it, while the newest frame still has a
+requester waiting for the answer.
+
+RouteTable and PeerCache let the relay learn where frames go instead of
+fanning every reply out to a fixed list: requests record the MAC they came
+from under their sequence number, the reply with the same sequence number goes
+back to that MAC only, and peers are added when they are first heard from.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+from machine import Timer  # type: ignore
+import time
+
+from gate_protocol import MAX_FRAME
+
+NO_MEM = "ESP_ERR_ESPNOW_NO_MEM"  # Send buffer of the radio is full, try again later
+
+
+class ForwardQueue:
+    """
+    Bounded FIFO of frames waiting to be sent.
+
+    Attributes:
+        size (int): Number of frames the queue holds.
+        drop_oldest (bool): When full, drop the oldest frame (True) or the new one (False).
+        dropped (int): Number of frames dropped because the queue was full.
+    """
+
+    def __init__(self, size=16, drop_oldest=True):
+        """
+        Initializes the queue.
+
+        Args:
+            size (int): Number of frames to hold.
+            drop_oldest (bool): Overload policy, see the class attributes.
+        """
+        self.size = size
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self._macs = [None] * size
+        self._bufs = [bytearray(MAX_FRAME) for _ in range(size)]
+        self._views = [memoryview(buf) for buf in self._bufs]
+        self._lens = [0] * size
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, mac, msg):
+        """
+        Copies a frame into the queue. The message buffer can be reused right away.
+
+        Args:
+            mac (bytes): Destination MAC address.
+            msg (bytes): Frame to send.
+        Returns:
+            bool: False if the frame was dropped.
+        """
+        if len(msg) > MAX_FRAME:
+            self.dropped += 1
+            return False
+        if self._count == self.size:
+            self.dropped += 1
+            if not self.drop_oldest:
+                return False
+            self.pop()
+        i = (self._head + self._count) % self.size
+        self._macs[i] = mac
+        self._views[i][: len(msg)] = msg
+        self._lens[i] = len(msg)
+        self._count += 1
+        return True
+
+    def peek(self):
+        """
+        Returns the oldest frame without removing it.
+
+        Returns:
+            tuple: (mac, frame) where frame is a view into the queue, or (None, None) if empty.
+        """
+        if self._count == 0:
+            return None, None
+        i = self._head
+        return self._macs[i], self._views[i][: self._lens[i]]
+
+    def pop(self):
+        """
+        Removes the oldest frame.
+        """
+        if self._count:
+            self._macs[self._head] = None
+            self._head = (self._head + 1) % self.size
+            self._count -= 1
+
+
+class RouteTable:
+    """
+    Remembers which peer each request came from, keyed by its sequence number.
+
+    Entries live in a fixed ring, so the newest requests overwrite the oldest
+    ones, and entries older than max_age_ms are ignored.
+
+    Attributes:
+        size (int): Number of requests remembered.
+        max_age_ms (int): Time a reply is expected within, in ms.
+    """
+
+    def __init__(self, size=32, max_age_ms=10000):
+        """
+        Initializes the table.
+
+        Args:
+            size (int): Number of requests to remember.
+            max_age_ms (int): Age in ms after which an entry is forgotten.
+        """
+        self.size = size
+        self.max_age_ms = max_age_ms
+        self._seqs = [-1] * size
+        self._macs = [None] * size
+        self._times = [0] * size
+        self._next = 0
+
+    def learn(self, seq, mac):
+        """
+        Records that the request with this sequence number came from mac.
+        """
+        now = time.ticks_ms()
+        for i in range(self.size):
+            if self._seqs[i] == seq and self._macs[i] == mac:
+                self._times[i] = now  # Retry of a known request
+                return
+        i = self._next
+        self._seqs[i] = seq
+        self._macs[i] = mac
+        self._times[i] = now
+        self._next = (i + 1) % self.size
+
+    def lookup(self, seq):
+        """
+        Returns the MACs of the recent requests with this sequence number.
+
+        Entries are kept after a lookup, since a reply can span several frames.
+
+        Returns:
+            list: Requester MACs, usually one. Empty if the sequence number is unknown or too old.
+        """
+        now = time.ticks_ms()
+        macs = []
+        for i in range(self.size):
+            if self._seqs[i] != seq:
+                continue
+            if time.ticks_diff(now, self._times[i]) > self.max_age_ms:
+                self._seqs[i] = -1  # Aged out
+                self._macs[i] = None
+            elif self._macs[i] not in macs:
+                macs.append(self._macs[i])
+        return macs
+
+
+class PeerCache:
+    """
+    Adds ESP-NOW peers when they are first heard from and removes idle ones.
+
+    ESP-NOW holds at most 20 peers, so when the cache is full the peer that was
+    heard from least recently is replaced. Pinned peers are never removed.
+
+    Attributes:
+        max_peers (int): Number of learned peers to keep.
+        idle_ms (int): Learned peers not heard from for this long are removed.
+    """
+
+    def __init__(self, e, max_peers=16, idle_ms=600000):
+        """
+        Initializes the cache.
+
+        Args:
+            e (ESPNow): Active ESP-NOW object.
+            max_peers (int): Number of learned peers to keep.
+            idle_ms (int): Idle time in ms after which a learned peer is removed.
+        """
+        self.e = e
+        self.max_peers = max_peers
+        self.idle_ms = idle_ms
+        self._last_seen = {}
+        self._pinned = set()
+
+    def pin(self, mac):
+        """
+        Adds a peer that is always kept, e.g. the admin board.
+        """
+        self._pinned.add(mac)
+        self._add(mac)
+
+    def _add(self, mac):
+        try:
+            self.e.add_peer(mac)
+        except OSError:
+            pass  # Already a peer
+
+    def seen(self, mac):
+        """
+        Records a frame from mac, adding it as a peer if it is new.
+        """
+        if mac in self._pinned:
+            return
+        now = time.ticks_ms()
+        if mac not in self._last_seen:
+            self.expire(now)
+            if len(self._last_seen) >= self.max_peers:
+                self._remove(self.least_recent())
+            self._add(mac)
+        self._last_seen[mac] = now
+
+    def least_recent(self):
+        oldest = None
+        for mac, seen in self._last_seen.items():
+            if oldest is None or time.ticks_diff(seen, self._last_seen[oldest]) < 0:
+                oldest = mac
+        return oldest
+
+    def expire(self, now=None):
+        """
+        Removes the learned peers that have been idle for longer than idle_ms.
+        """
+        if now is None:
+            now = time.ticks_ms()
+        for mac in [m for m, seen in self._last_seen.items() if time.ticks_diff(now, seen) > self.idle_ms]:
+            self._remove(mac)
+
+    def _remove(self, mac):
+        del self._last_seen[mac]
+        try:
+            self.e.del_peer(mac)
+        except OSError:
+            pass
+
+    def macs(self):
+        """
+        Returns the learned peers that are not idle.
+        """
+        self.expire()
+        return list(self._last_seen)
+
+
+class Relay:
+    """
+    Forwards received ESP-NOW frames through a ForwardQueue.
+
+    Attributes:
+        queue (ForwardQueue): Frames waiting to be sent.
+        forwarded (int): Number of frames handed to the radio.
+        failed (int): Number of frames the radio refused for good.
+    """
+
+    def __init__(self, e, route, queue=None, retry_timer=None, retry_ms=5, on_frame=None):
+        """
+        Initializes the relay. Install it with e.irq(relay.on_recv).
+
+        Args:
+            e (ESPNow): Active ESP-NOW object.
+            route (function): Called as route(mac, msg), returns the destination MACs of a frame.
+            queue (ForwardQueue): Queue to use, a default one is created if None.
+            retry_timer (Timer): Timer used to retry when the radio is busy, Timer(0) if None.
+            retry_ms (int): Delay before retrying in ms.
+            on_frame (function): Optional, called as on_frame(mac, msg) for every received frame.
+        """
+        self.e = e
+        self.route = route
+        self.queue = queue or ForwardQueue()
+        self.retry_timer = retry_timer or Timer(0)
+        self.retry_ms = retry_ms
+        self.on_frame = on_frame
+        self.forwarded = 0
+        self.failed = 0
+        self._retrying = False
+
+    def on_recv(self, e):
+        """
+        ESP-NOW receive callback. Drains every waiting frame, then returns.
+        """
+        while True:
+            mac, msg = e.irecv(0)  # Don't wait if no messages left
+            if mac is None:
+                break
+            if self.on_frame is not None:
+                self.on_frame(mac, msg)
+            for destination in self.route(mac, msg):
+                self.queue.push(destination, msg)  # irecv() reuses msg, the queue keeps a copy
+        if not self._retrying:
+            self.flush()
+
+    def flush(self, timer=None):
+        """
+        Sends queued frames until the queue is empty or the radio is busy.
+        """
+        self._retrying = False
+        queue = self.queue
+        while len(queue):
+            mac, frame = queue.peek()
+            try:
+                self.e.send(mac, frame, False)  # Don't wait for the peer to acknowledge
+            except OSError as ex:
+                if len(ex.args) > 1 and ex.args[1] == NO_MEM:
+                    # Keep the frame and try again once the radio has sent some
+                    self._retrying = True
+                    self.retry_timer.init(mode=Timer.ONE_SHOT, period=self.retry_ms, callback=self.flush)
+                    return
+                print(f"[Relay] Failed to send to {mac}: {ex}")
+                self.failed += 1
+            else:
+                self.forwarded += 1
+            queue.pop()
@@ -0,0 +1,150 @@
+"""
+event_log.py
+
+Fixed-size binary event log for the gate controller. Records are written into
+a preallocated bytearray ring, so logging does not allocate, format strings or
+block on the UART and is safe inside IRQ and Timer callbacks. The ring is
+decoded into text only when it is dumped.
+
+Record layout (8 bytes, little endian):
+    0-3  ticks_ms() of the event
+    4    event code (LOG_*)
+    5    leaf number (0 when the event is not about a leaf)
+    6    leaf state when the record was written
+    7    extra argument (e.g. the gate_fsm event that caused a transition)
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import time
+
+from lib.gate_fsm import STATE_NAMES, EVENT_NAMES  # Same path as the controllers, so it is loaded once
+
+RECORD_SIZE = 8
+MAX_COUNT = 0x3FFFFFFF  # Largest small int on the ESP32, count stops there so it never allocates
+
+# Event codes
+LOG_BUTTON = 1  # Open request from the push button or ESP-NOW
+LOG_SYSTEM_ON = 2  # System activated
+LOG_OPEN_REACHED = 3  # Leaf open sensor fired
+LOG_BREAK = 4  # Break sensor fired
+LOG_CLOSE_BLOCKED = 5  # Countdown expired while the break sensor was active
+LOG_CLOSE_DONE = 6  # Leaf close timer expired
+LOG_TRANSITION = 7  # Leaf changed state, arg is the gate_fsm event
+LOG_ALL_CLOSED = 8  # Both leaves closed
+LOG_SYSTEM_OFF = 9  # System deactivated
+LOG_ESPNOW_RX = 10  # ESP-NOW frame received, arg is its parsed opcode
+LOG_COUNTDOWN = 11  # Countdown restarted
+
+LOG_NAMES = {
+    LOG_BUTTON: "button",
+    LOG_SYSTEM_ON: "system on",
+    LOG_OPEN_REACHED: "open reached",
+    LOG_BREAK: "break",
+    LOG_CLOSE_BLOCKED: "close blocked",
+    LOG_CLOSE_DONE: "close done",
+    LOG_TRANSITION: "transition",
+    LOG_ALL_CLOSED: "all closed",
+    LOG_SYSTEM_OFF: "system off",
+    LOG_ESPNOW_RX: "espnow rx",
+    LOG_COUNTDOWN: "countdown",
+}
+
+
+class EventLog:
+    """
+    Ring buffer of binary event records.
+
+    Attributes:
+        capacity (int): Number of records the ring holds before overwriting the oldest.
+        count (int): Total number of records written since creation, up to MAX_COUNT.
+    """
+
+    def __init__(self, capacity=128):
+        """
+        Initializes the ring.
+
+        Args:
+            capacity (int): Number of records to keep.
+        """
+        self.capacity = capacity
+        self._buf = bytearray(capacity * RECORD_SIZE)
+        self._pos = 0
+        self.count = 0
+
+    def record(self, code, leaf=0, state=0, arg=0):
+        """
+        Writes one record. Does not allocate, so it is safe in hard IRQs.
+
+        Args:
+            code (int): One of the LOG_* codes.
+            leaf (int): Leaf number, or 0.
+            state (int): Leaf state.
+            arg (int): Extra byte.
+        """
+        buf = self._buf
+        i = self._pos
+        t = time.ticks_ms()
+        buf[i] = t & 0xFF
+        buf[i + 1] = (t >> 8) & 0xFF
+        buf[i + 2] = (t >> 16) & 0xFF
+        buf[i + 3] = (t >> 24) & 0xFF
+        buf[i + 4] = code
+        buf[i + 5] = leaf
+        buf[i + 6] = state
+        buf[i + 7] = arg & 0xFF
+        i += RECORD_SIZE
+        self._pos = 0 if i >= len(buf) else i
+        if self.count < MAX_COUNT:
+            self.count += 1
+
+    def clear(self):
+        self._pos = 0
+        self.count = 0
+
+    def snapshot(self):
+        """
+        Copies the stored records, oldest first.
+
+        Returns:
+            bytes: Concatenated 8 byte records.
+        """
+        if self.count < self.capacity:
+            return bytes(self._buf[: self._pos])
+        return bytes(self._buf[self._pos :]) + bytes(self._buf[: self._pos])
+
+    def dump(self, write=print):
+        """
+        Decodes the stored records and writes one line per record, oldest first.
+
+        Args:
+            write (function): Function that takes a line of text.
+        """
+        for line in decode(self.snapshot()):
+            write(line)
+
+
+def decode(data):
+    """
+    Decodes records produced by EventLog.snapshot().
+
+    Args:
+        data (bytes): Concatenated 8 byte records.
+    Returns:
+        list: One text line per record.
+    """
+    lines = []
+    for i in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        t = data[i] | (data[i + 1] << 8) | (data[i + 2] << 16) | (data[i + 3] << 24)
+        code, leaf, state, arg = data[i + 4], data[i + 5], data[i + 6], data[i + 7]
+        line = "%10d %s" % (t, LOG_NAMES.get(code, "code %d" % code))
+        if leaf:
+            state_name = STATE_NAMES[state] if state < len(STATE_NAMES) else str(state)
+            line += " gate %d %s" % (leaf, state_name)
+        if code == LOG_TRANSITION and arg < len(EVENT_NAMES):
+            line += " on " + EVENT_NAMES[arg]
+        elif arg:
+            line += " (%d)" % arg
+        lines.append(line)
+    return lines
@@ -1,37 +1,157 @@
 import time
 from machine import Pin  # type: ignore
 
+RELAY_SETTLE_TIME = 100  # Time between two relay edges of the same leaf in ms
+
+
+class RelaySequencer:
+    """
+    Schedules relay edges on ticks instead of sleeping between them.
+
+    Edges are kept in preallocated slots and applied by service(), which the
+    app calls from a periodic timer or task. Scheduling never blocks, so it is
+    safe to use from IRQ and Timer callbacks, and several leaves can be moved
+    at the same time.
+
+    Attributes:
+        size (int): Maximum number of pending edges.
+    """
+
+    def __init__(self, size=8):
+        """
+        Initializes the sequencer.
+
+        Args:
+            size (int): Maximum number of pending edges.
+        """
+        self.size = size
+        self._pins = [None] * size
+        self._values = [0] * size
+        self._due = [0] * size
+
+    def schedule(self, pin, value, delay_ms=0):
+        """
+        Schedules a pin to be set after a delay.
+
+        Args:
+            pin (Pin): Relay output pin.
+            value (int): Value to write.
+            delay_ms (int): Delay from now in ms.
+        """
+        for i in range(self.size):
+            if self._pins[i] is None:
+                self._pins[i] = pin
+                self._values[i] = value
+                self._due[i] = time.ticks_add(time.ticks_ms(), delay_ms)
+                return
+        # Out of slots, apply the edge right away rather than losing it
+        pin.value(value)
+
+    def cancel(self, pin):
+        """
+        Drops every pending edge of a pin.
+
+        Args:
+            pin (Pin): Relay output pin.
+        """
+        for i in range(self.size):
+            if self._pins[i] is pin:
+                self._pins[i] = None
+
+    def service(self):
+        """
+        Applies every edge that is due. Edges of a pin are applied in the order they were due.
+
+        Returns:
+            int: Time in ms until the next pending edge, or -1 if nothing is pending.
+        """
+        now = time.ticks_ms()
+        next_due = -1
+        applied = True
+        while applied:
+            applied = False
+            first = -1
+            for i in range(self.size):
+                if self._pins[i] is not None and time.ticks_diff(self._due[i], now) <= 0:
+                    if first < 0 or time.ticks_diff(self._due[i], self._due[first]) < 0:
+                        first = i
+            if first >= 0:
+                pin = self._pins[first]
+                self._pins[first] = None
+                pin.value(self._values[first])
+                applied = True
+        for i in range(self.size):
+            if self._pins[i] is not None:
+                wait = time.ticks_diff(self._due[i], now)
+                if next_due < 0 or wait < next_due:
+                    next_due = wait
+        return next_due
+
+    def pending(self):
+        """
+        Returns True if any edge is still waiting to be applied.
+        """
+        for pin in self._pins:
+            if pin is not None:
+                return True
+        return False
+
 
 class Gate:
-    def __init__(self, motor_enable, motor_direction):
+    def __init__(self, motor_enable, motor_direction, sequencer, open_delay=0, close_delay=0):
+        """
+        Initializes the relays of one gate leaf.
+
+        Args:
+            motor_enable (int): Pin that turns the motor on/off.
+            motor_direction (int): Pin that sets the motor direction.
+            sequencer (RelaySequencer): Sequencer that applies the relay edges.
+            open_delay (int): Extra delay in ms before the motor starts opening. Used to stagger overlapping leaves.
+            close_delay (int): Extra delay in ms before the motor starts closing.
+        """
         self.motor_enable = Pin(motor_enable, Pin.OUT)
         self.motor_direction = Pin(motor_direction, Pin.OUT)
+        self.sequencer = sequencer
+        self.open_delay = open_delay
+        self.close_delay = close_delay
         self.status = 0  # 0 = closed, 1 = opening, 2 = opened, 3 = closing
 
+    def lead_time(self, opening):
+        """
+        Returns the time in ms between a move call and the motor actually turning on.
+
+        Args:
+            opening (bool): True for move_ccw, False for move_cw.
+        """
+        return (self.open_delay if opening else self.close_delay) + 2 * RELAY_SETTLE_TIME
+
+    def _drive(self, direction, delay):
+        """
+        Stops the motor now, then sets the direction and turns the motor back on through the sequencer.
+        """
+        self.sequencer.cancel(self.motor_enable)
+        self.sequencer.cancel(self.motor_direction)
+        self.motor_enable.value(0)
+        self.sequencer.schedule(self.motor_direction, direction, delay + RELAY_SETTLE_TIME)
+        self.sequencer.schedule(self.motor_enable, 1, delay + 2 * RELAY_SETTLE_TIME)
+
     def move_ccw(self):
         """
         Non-blocking function that moves the gate one way.
         """
-        self.motor_enable.value(0)
-        time.sleep(0.1)
-        self.motor_direction.value(1)
-        time.sleep(0.1)
-        self.motor_enable.value(1)
+        self._drive(1, self.open_delay)
 
     def move_cw(self):
         """
         Non-blocking function that starts closing the gate.
         """
-        self.motor_enable.value(0)
-        time.sleep(0.1)
-        self.motor_direction.value(0)
-        time.sleep(0.1)
-        self.motor_enable.value(1)
+        self._drive(0, self.close_delay)
 
     def stop_gate(self):
         """
         Non-blocking function that stops.
         """
+        self.sequencer.cancel(self.motor_enable)
+        self.sequencer.cancel(self.motor_direction)
         self.motor_enable.value(0)
-        time.sleep(0.1)
-        self.motor_direction.value(0)
+        self.sequencer.schedule(self.motor_direction, 0, RELAY_SETTLE_TIME)
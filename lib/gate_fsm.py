@@ -0,0 +1,277 @@
+"""
+gate_fsm.py
+
+Transition table for the swing gate leaves. Every leaf is driven through the
+same (state, event) -> (actions, next state) table, so the controller apps only
+have to translate pins and timers into events and bind the actions to their
+own hardware.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+# Leaf states (same values as Gate.status)
+CLOSED = 0
+OPENING = 1
+OPENED = 2
+CLOSING = 3
+STATE_COUNT = 4
+
+STATE_NAMES = ("closed", "opening", "opened", "closing")
+
+# Events
+EV_OPEN_REQUEST = 0  # Push button or ESP-NOW open command
+EV_BREAK = 1  # Break sensor tripped
+EV_OPEN_REACHED = 2  # Leaf open sensor fired
+EV_CLOSE_REQUEST = 3  # Keep-open countdown expired
+EV_CLOSE_DONE = 4  # Leaf close timer expired
+EVENT_COUNT = 5
+
+EVENT_NAMES = ("open request", "break", "open reached", "close request", "close done")
+
+# Leaf actions, bound to real functions by GateMachine
+A_OPEN = 0  # Start the motor in the opening direction
+A_CLOSE = 1  # Start the motor in the closing direction
+A_STOP = 2  # Stop the motor
+A_ARM_SENSOR = 3  # Enable the leaf open sensor
+A_DISARM_SENSOR = 4  # Disable the leaf open sensor
+A_START_CLOSE_TIMER = 5  # Start the leaf close timer
+A_CANCEL_CLOSE_TIMER = 6  # Cancel the leaf close timer
+A_RESTART_COUNTDOWN = 7  # Restart the keep-open countdown
+A_ARM_BREAK = 8  # Enable the break sensor
+A_DISARM_BREAK = 9  # Disable the break sensor
+ACTION_COUNT = 10
+
+# A closing leaf that gets interrupted reopens, unless it is still sitting on
+# its open sensor, in which case it is simply stopped and considered opened.
+_REOPEN = ((A_CANCEL_CLOSE_TIMER, A_STOP, A_OPEN, A_ARM_SENSOR), OPENING)
+_HOLD_OPEN = ((A_CANCEL_CLOSE_TIMER, A_STOP), OPENED)
+
+# (state, event): (actions, next state, alternative used when the leaf is at its open sensor)
+# Pairs that are not listed are ignored.
+TRANSITIONS = {
+    (CLOSED, EV_OPEN_REQUEST): ((A_OPEN, A_ARM_SENSOR, A_DISARM_BREAK), OPENING, None),
+    (OPENED, EV_OPEN_REQUEST): ((A_RESTART_COUNTDOWN,), OPENED, None),
+    (CLOSING, EV_OPEN_REQUEST): _REOPEN + (_HOLD_OPEN,),
+    (OPENED, EV_BREAK): ((A_RESTART_COUNTDOWN,), OPENED, None),
+    (CLOSING, EV_BREAK): _REOPEN + (_HOLD_OPEN,),
+    (OPENING, EV_OPEN_REACHED): (
+        (A_STOP, A_DISARM_SENSOR, A_CANCEL_CLOSE_TIMER, A_RESTART_COUNTDOWN, A_DISARM_BREAK),
+        OPENED,
+        None,
+    ),
+    (OPENED, EV_CLOSE_REQUEST): ((A_CLOSE, A_START_CLOSE_TIMER, A_ARM_BREAK), CLOSING, None),
+    (CLOSING, EV_CLOSE_DONE): ((A_STOP,), CLOSED, None),
+}
+
+
+def _flatten(transitions):
+    """
+    Flattens the transition dictionary into a list indexed by state * EVENT_COUNT + event.
+    """
+    table = [None] * (STATE_COUNT * EVENT_COUNT)
+    for (state, event), entry in transitions.items():
+        table[state * EVENT_COUNT + event] = entry
+    return table
+
+
+_TABLE = _flatten(TRANSITIONS)
+
+
+class Leaf:
+    """
+    One gate leaf and the hardware the controller attached to it.
+
+    Attributes:
+        number (int): Leaf number used in log messages (1 or 2).
+        gate (Gate): Relay driver of the leaf. Its status holds the leaf state.
+        open_sensor: Debounced open sensor of the leaf.
+        close_timer: Timer that ends the closing stroke.
+        time_to_close (int): Closing stroke duration in ms.
+    """
+
+    def __init__(self, number, gate, open_sensor, close_timer=None, time_to_close=0):
+        self.number = number
+        self.gate = gate
+        self.open_sensor = open_sensor
+        self.close_timer = close_timer
+        self.time_to_close = time_to_close
+
+    @property
+    def status(self):
+        return self.gate.status
+
+    def at_open(self):
+        """
+        Returns True if the leaf is sitting on its open sensor.
+        """
+        return self.open_sensor.pin.value() == 1
+
+
+class GateMachine:
+    """
+    Dispatches events to the leaves through the shared transition table.
+
+    Every action code in the table is bound to a function taking the leaf it
+    applies to. Dispatching an event is a single table lookup followed by the
+    bound actions.
+
+    Attributes:
+        leaves (tuple): Leaves driven by this machine.
+    """
+
+    def __init__(
+        self,
+        leaves,
+        open_leaf,
+        close_leaf,
+        stop_leaf,
+        arm_sensor,
+        disarm_sensor,
+        start_close_timer,
+        cancel_close_timer,
+        restart_countdown,
+        arm_break,
+        disarm_break,
+        trace=None,
+    ):
+        """
+        Initializes the machine and binds the action codes.
+
+        Args:
+            leaves (tuple): Leaves driven by this machine.
+            open_leaf, close_leaf, stop_leaf, arm_sensor, disarm_sensor, start_close_timer,
+            cancel_close_timer, restart_countdown, arm_break, disarm_break (function):
+                Implementation of the matching A_* action. Each takes the leaf.
+            trace (function): Optional function called with the leaf and the event after every transition.
+        """
+        self.leaves = tuple(leaves)
+        self._actions = (
+            open_leaf,
+            close_leaf,
+            stop_leaf,
+            arm_sensor,
+            disarm_sensor,
+            start_close_timer,
+            cancel_close_timer,
+            restart_countdown,
+            arm_break,
+            disarm_break,
+        )
+        self._trace = trace
+
+    def dispatch(self, leaf, event):
+        """
+        Runs the transition of a leaf for an event.
+
+        Args:
+            leaf (Leaf): Leaf receiving the event.
+            event (int): One of the EV_* codes.
+        Returns:
+            bool: True if the event caused a transition, False if it was ignored.
+        """
+        entry = _TABLE[leaf.gate.status * EVENT_COUNT + event]
+        if entry is None:
+            return False
+        actions, next_state, alternative = entry
+        if alternative is not None and leaf.at_open():
+            actions, next_state = alternative
+        bound = self._actions
+        for action in actions:
+            bound[action](leaf)
+        leaf.gate.status = next_state
+        if self._trace is not None:
+            self._trace(leaf, event)
+        return True
+
+    def broadcast(self, event):
+        """
+        Dispatches an event to every leaf.
+
+        Args:
+            event (int): One of the EV_* codes.
+        Returns:
+            bool: True if any leaf changed state.
+        """
+        changed = False
+        for leaf in self.leaves:
+            if self.dispatch(leaf, event):
+                changed = True
+        return changed
+
+    def any_in(self, state):
+        """
+        Returns True if any leaf is in the given state.
+        """
+        for leaf in self.leaves:
+            if leaf.gate.status == state:
+                return True
+        return False
+
+    def all_in(self, state):
+        """
+        Returns True if every leaf is in the given state.
+        """
+        for leaf in self.leaves:
+            if leaf.gate.status != state:
+                return False
+        return True
+
+
+class EventQueue:
+    """
+    Fixed-size queue of (leaf, event) pairs that IRQ handlers can post to.
+
+    Each entry is packed into one byte of a preallocated bytearray, so posting
+    never allocates. Leaf index 0x0F means the event is for every leaf.
+
+    Attributes:
+        dropped (int): Number of events lost because the queue was full.
+    """
+
+    ALL_LEAVES = 0x0F
+
+    def __init__(self, size=16, notify=None):
+        """
+        Initializes the queue.
+
+        Args:
+            size (int): Maximum number of queued events.
+            notify (function): Called without arguments after every post, e.g. ThreadSafeFlag.set.
+        """
+        self._buf = bytearray(size)
+        self._size = size
+        self._head = 0
+        self._tail = 0
+        self._notify = notify
+        self.dropped = 0
+
+    def post(self, event, leaf=ALL_LEAVES):
+        """
+        Posts an event. Safe to call from an IRQ handler.
+
+        Args:
+            event (int): One of the EV_* codes.
+            leaf (int): Index of the leaf in GateMachine.leaves, or ALL_LEAVES.
+        """
+        head = (self._head + 1) % self._size
+        if head == self._tail:
+            self.dropped += 1
+        else:
+            self._buf[self._head] = (leaf << 4) | event
+            self._head = head
+        if self._notify is not None:
+            self._notify()
+
+    def get(self):
+        """
+        Pops the oldest event.
+
+        Returns:
+            (leaf, event): Tuple of leaf index and event code, or None if the queue is empty.
+        """
+        if self._tail == self._head:
+            return None
+        packed = self._buf[self._tail]
+        self._tail = (self._tail + 1) % self._size
+        return packed >> 4, packed & 0x0F
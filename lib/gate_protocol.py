@@ -0,0 +1,180 @@
+"""
+gate_protocol.py
+
+Binary message format shared by every ESP-NOW board of the gate access system.
+
+Frame layout:
+    0    MAGIC | PROTOCOL_VERSION
+    1    opcode (OP_*)
+    2-3  sequence number, little endian
+    4    role of the board that created the frame (ROLE_*)
+    5    payload length
+    6-   payload
+
+Older boards send the bare opcode followed by the payload (e.g. b"\\x01" to open
+the gate). None of those opcodes has the MAGIC bits set, so parse() accepts both
+and reports the old frames with version 0.
+
+Parsing does not copy: the payload is a memoryview slice of the received frame.
+Encoding writes into a preallocated buffer that is reused for every frame.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import os
+
+MAGIC = 0xC0
+PROTOCOL_VERSION = 1
+HEADER_SIZE = 6
+MAX_FRAME = 250  # Largest ESP-NOW payload
+MAX_PAYLOAD = MAX_FRAME - HEADER_SIZE
+
+# Opcodes
+OP_OPEN = 0x01  # Open the gate
+OP_LOG_REQUEST = 0x02  # Ask the gate controller for its event log
+OP_LOG_RECORDS = 0x03  # Event log reply, payload is the frame index and the records
+OP_CACHE_INVALIDATE = 0x04  # Admin broadcast, payload is the UIDs to forget or empty to forget all
+OP_BLOOM_REQUEST = 0x05  # Reader asks the admin for the whole allowlist filter
+OP_BLOOM_CHUNK = 0x06  # Part of the allowlist filter, payload is the chunk index, chunk count and data
+OP_BLOOM_UPDATE = 0x07  # Admin broadcast of filter chunks that changed, same payload as OP_BLOOM_CHUNK
+OP_INSIDE_REQUEST = 0xA1  # Card scanned by the inside reader, payload is the UID
+OP_INSIDE_GRANTED = 0xA2
+OP_INSIDE_DENIED = 0xA3
+OP_OUTSIDE_REQUEST = 0xB1  # Card scanned by the outside reader, payload is the UID
+OP_OUTSIDE_GRANTED = 0xB2
+OP_OUTSIDE_DENIED = 0xB3
+
+# Roles
+ROLE_UNKNOWN = 0  # Frames in the old format
+ROLE_ADMIN = 1
+ROLE_RUNNER = 2
+ROLE_INSIDE_READER = 3
+ROLE_OUTSIDE_READER = 4
+ROLE_GATE_CONTROLLER = 5
+ROLE_TOOL = 6  # Utility scripts and push buttons
+
+
+class Message:
+    """
+    A parsed frame. parse() refills the same object, so copy what you need to keep.
+
+    Attributes:
+        version (int): PROTOCOL_VERSION, or 0 for a frame in the old format.
+        opcode (int): One of the OP_* codes.
+        seq (int): Sequence number set by the sender.
+        role (int): Role of the sender.
+        payload (memoryview): Payload bytes, a view into the received frame.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.opcode = 0
+        self.seq = 0
+        self.role = ROLE_UNKNOWN
+        self.payload = memoryview(b"")
+
+
+def parse(frame, message=None):
+    """
+    Parses a received frame.
+
+    Args:
+        frame (bytes): Received frame.
+        message (Message): Object to fill in, a new one is created if None.
+    Returns:
+        Message: The parsed frame, or None if it is empty or truncated.
+    """
+    if not frame:
+        return None
+    if message is None:
+        message = Message()
+    view = memoryview(frame)
+    first = frame[0]
+    if first & 0xF0 != MAGIC:
+        # Old format, the first byte is the opcode
+        message.version = 0
+        message.opcode = first
+        message.seq = 0
+        message.role = ROLE_UNKNOWN
+        message.payload = view[1:]
+        return message
+    if len(frame) < HEADER_SIZE or len(frame) < HEADER_SIZE + frame[5]:
+        return None
+    message.version = first & 0x0F
+    message.opcode = frame[1]
+    message.seq = frame[2] | (frame[3] << 8)
+    message.role = frame[4]
+    message.payload = view[HEADER_SIZE : HEADER_SIZE + frame[5]]
+    return message
+
+
+class Encoder:
+    """
+    Builds frames for one board in a preallocated buffer.
+
+    The frame returned by encode() is a view into that buffer, so send it before
+    encoding the next one.
+
+    Attributes:
+        role (int): Role written into every frame.
+        seq (int): Sequence number of the last frame.
+    """
+
+    def __init__(self, role, seq=None):
+        """
+        Initializes the encoder.
+
+        Args:
+            role (int): One of the ROLE_* codes.
+            seq (int): First sequence number minus one. Random if None, so boards that
+                boot together do not reuse each other's numbers (the runner routes replies by them).
+        """
+        self.role = role
+        self.seq = int.from_bytes(os.urandom(2), "little") if seq is None else seq
+        self._buf = bytearray(MAX_FRAME)
+        self._view = memoryview(self._buf)
+
+    def next_seq(self):
+        """
+        Returns a new sequence number.
+        """
+        self.seq = (self.seq + 1) & 0xFFFF
+        return self.seq
+
+    def encode(self, opcode, *parts, seq=-1):
+        """
+        Encodes a frame. The payload is the parts copied one after the other.
+
+        Args:
+            opcode (int): One of the OP_* codes.
+            parts: Payload pieces, each a buffer (bytes, bytearray, memoryview) or a single byte as an int.
+            seq (int): Sequence number, e.g. of the request being answered. A new one is used if negative.
+        Returns:
+            memoryview: The encoded frame.
+        Raises:
+            ValueError: If the payload does not fit in one frame.
+        """
+        if seq < 0:
+            seq = self.next_seq()
+        buf = self._buf
+        end = HEADER_SIZE
+        for part in parts:
+            if isinstance(part, int):
+                if end >= MAX_FRAME:
+                    raise ValueError("payload too long")
+                buf[end] = part
+                end += 1
+                continue
+            size = len(part)
+            if end + size > MAX_FRAME:
+                raise ValueError("payload too long")
+            self._view[end : end + size] = part
+            end += size
+        buf[0] = MAGIC | PROTOCOL_VERSION
+        buf[1] = opcode
+        buf[2] = seq & 0xFF
+        buf[3] = (seq >> 8) & 0xFF
+        buf[4] = self.role
+        buf[5] = end - HEADER_SIZE
+        return self._view[:end]
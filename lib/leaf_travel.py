@@ -0,0 +1,260 @@
+"""
+leaf_travel.py
+
+Learns how long each gate leaf takes to travel, so the closing stroke follows
+the motors as they age instead of staying at hand-measured constants. Opening
+strokes are timed from the moment the motor turns on until the open sensor
+fires, and a running average of those times is kept per leaf and persisted to
+flash.
+
+There is no closed sensor, so the closing stroke is never measured. It is
+scaled from the hand-measured close time by how much slower the leaf opens
+than when it was first timed, and never drops below the hand-measured value.
+Only strokes that start from a verified full close are timed, so a close that
+fell short can not make the next opening stroke look faster.
+
+The position of every leaf is also dead-reckoned from how long its motor ran in
+each direction, so a leaf that was stopped or reversed part way only gets the
+closing time it still needs instead of a full stroke.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import json
+import time
+
+CLOSE_MARGIN = 500  # Extra closing time in ms so the leaf always reaches its end stop
+FULLY_OPEN = 1000  # Position of an opened leaf, positions are in 1/1000 of the full stroke
+ACCEPT_AFTER = 3  # Consistent out-of-tolerance strokes in a row that replace the estimate
+
+
+class TravelLearner:
+    """
+    Running estimate of the full travel time and the position of every leaf.
+
+    Positions are integers from 0 (closed) to FULLY_OPEN, so updating them does
+    not allocate floats.
+
+    Attributes:
+        close_times (tuple): Hand-measured full closing stroke of each leaf in ms, the shortest close used.
+        open_times (list): Estimated full opening stroke of each leaf in ms.
+        reference_open_times (list): Opening stroke of each leaf when it was first timed, None until then.
+            The closing stroke grows with open_times / reference_open_times.
+        positions (list): Position of each leaf when its motor was last started or stopped.
+        margin (int): Added to the closing stroke in ms.
+        path (str): JSON file the estimates are stored in.
+    """
+
+    def __init__(
+        self,
+        close_times,
+        path="travel.json",
+        margin=CLOSE_MARGIN,
+        alpha=0.25,
+        tolerance=0.3,
+        accept_after=ACCEPT_AFTER,
+    ):
+        """
+        Initializes the learner and loads the stored estimates, if any.
+
+        Args:
+            close_times (tuple): Hand-measured full closing stroke of each leaf in ms, without margin.
+                They are also the opening estimates until the first strokes are timed.
+            path (str): JSON file the estimates are stored in.
+            margin (int): Added to the closing stroke in ms.
+            alpha (float): Weight of a new measurement in the running average.
+            tolerance (float): Measurements further than this fraction from the estimate are ignored
+                (e.g. the leaf was blocked).
+            accept_after (int): Ignored measurements in a row that agree with each other within the
+                tolerance replace the estimate, e.g. when the defaults are far off.
+        """
+        count = len(close_times)
+        self.close_times = tuple(close_times)
+        self.open_times = list(close_times)
+        self.reference_open_times = [None] * count
+        self.path = path
+        self.margin = margin
+        self.alpha = alpha
+        self.tolerance = tolerance
+        self.accept_after = accept_after
+        self._started = [None] * count
+        self._at_close_stop = [False] * count  # True once a full closing stroke has run to its end
+        self._outliers = [0] * count  # Ignored measurements in a row
+        self._outlier_sums = [0] * count
+        self.positions = [FULLY_OPEN] * count  # Unknown after boot, assume the worst case
+        self._directions = [0] * count  # 1 opening, -1 closing, 0 stopped
+        self._since = [0] * count
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """
+        Loads the stored estimates. Missing or corrupt files keep the defaults.
+        """
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        for i, open_time in enumerate(stored.get("open_times", ())):
+            if i < len(self.open_times) and open_time > 0:
+                self.open_times[i] = int(open_time)
+        for i, open_time in enumerate(stored.get("reference_open_times", ())):
+            if i < len(self.open_times) and open_time and open_time > 0:
+                self.reference_open_times[i] = int(open_time)
+
+    def save(self):
+        """
+        Stores the estimates if they changed since the last save.
+
+        Writing flash takes a while, so call this when the gate is idle.
+        """
+        if not self._dirty:
+            return
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"open_times": self.open_times, "reference_open_times": self.reference_open_times}, f)
+        except OSError as e:
+            print(f"[Travel] Failed to save {self.path}: {e}")
+            return
+        self._dirty = False
+
+    def stroke_started(self, leaf, lead_ms=0):
+        """
+        Starts timing an opening stroke, if the leaf is known to be at its closed end stop.
+
+        Call it before motor_started(), which forgets where the leaf was.
+
+        Args:
+            leaf (int): Leaf index.
+            lead_ms (int): Time until the relays actually turn the motor on.
+        """
+        if self._at_close_stop[leaf] and self._directions[leaf] == 0:
+            self._started[leaf] = time.ticks_add(time.ticks_ms(), lead_ms)
+        else:
+            self._started[leaf] = None
+
+    def stroke_finished(self, leaf):
+        """
+        Ends the stroke being timed when the open sensor fires and updates the estimate.
+
+        Args:
+            leaf (int): Leaf index.
+        Returns:
+            int: Measured stroke in ms, or -1 if no full stroke was being timed or it was rejected.
+        """
+        # The leaf is at its open sensor whether or not the stroke was timed
+        self.positions[leaf] = FULLY_OPEN
+        self._directions[leaf] = 0
+        self._since[leaf] = time.ticks_ms()
+        started = self._started[leaf]
+        if started is None:
+            return -1
+        self._started[leaf] = None
+        measured = time.ticks_diff(time.ticks_ms(), started)
+        estimate = self.open_times[leaf]
+        if abs(measured - estimate) > estimate * self.tolerance:
+            return self._outlier(leaf, measured)
+        self._outliers[leaf] = 0
+        self._update(leaf, int(estimate + self.alpha * (measured - estimate)))
+        return measured
+
+    def _outlier(self, leaf, measured):
+        # Ignores a measurement far from the estimate, unless the last few all agree on a new value
+        count = self._outliers[leaf]
+        if count:
+            average = self._outlier_sums[leaf] // count
+            if abs(measured - average) > average * self.tolerance:
+                count = 0
+        if not count:
+            self._outlier_sums[leaf] = 0
+        count += 1
+        self._outliers[leaf] = count
+        self._outlier_sums[leaf] += measured
+        if count < self.accept_after:
+            return -1
+        self._outliers[leaf] = 0
+        self._update(leaf, self._outlier_sums[leaf] // count)
+        return measured
+
+    def _update(self, leaf, open_time):
+        if self.reference_open_times[leaf] is None:
+            # First timed stroke, the hand-measured close time belongs to this opening time
+            self.reference_open_times[leaf] = open_time
+            self._dirty = True
+        if open_time != self.open_times[leaf]:
+            self.open_times[leaf] = open_time
+            self._dirty = True
+
+    def _full_close_time(self, leaf):
+        # The hand-measured close, stretched if the leaf now opens slower than when it was first timed
+        close_time = self.close_times[leaf]
+        reference = self.reference_open_times[leaf]
+        if reference is None:
+            return close_time
+        return max(close_time, self.open_times[leaf] * close_time // reference)
+
+    def motor_started(self, leaf, opening, lead_ms=0):
+        """
+        Starts dead-reckoning a leaf that is being moved.
+
+        Args:
+            leaf (int): Leaf index.
+            opening (bool): True if the leaf moves towards its open sensor.
+            lead_ms (int): Time until the relays actually turn the motor on.
+        """
+        self.motor_stopped(leaf)
+        self._at_close_stop[leaf] = False
+        if not opening:
+            self._started[leaf] = None
+        self._directions[leaf] = 1 if opening else -1
+        self._since[leaf] = time.ticks_add(time.ticks_ms(), lead_ms)
+
+    def motor_stopped(self, leaf):
+        """
+        Adds the travel of a moving leaf to its position and marks it stopped.
+        """
+        self.positions[leaf] = self.position(leaf)
+        self._directions[leaf] = 0
+
+    def position(self, leaf):
+        """
+        Returns the estimated position of a leaf now, from 0 (closed) to FULLY_OPEN.
+        """
+        position = self.positions[leaf]
+        direction = self._directions[leaf]
+        if direction == 0:
+            return position
+        elapsed = max(0, time.ticks_diff(time.ticks_ms(), self._since[leaf]))
+        if direction > 0:
+            position += elapsed * FULLY_OPEN // self.open_times[leaf]
+        else:
+            position -= elapsed * FULLY_OPEN // self._full_close_time(leaf)
+        return min(FULLY_OPEN, max(0, position))
+
+    def set_position(self, leaf, position):
+        """
+        Sets the position of a stopped leaf.
+        """
+        self.positions[leaf] = position
+        self._directions[leaf] = 0
+
+    def close_finished(self, leaf, stroke_ms):
+        """
+        Marks a leaf closed once its closing stroke has run to its end.
+
+        Args:
+            leaf (int): Leaf index.
+            stroke_ms (int): Length of the stroke, as returned by close_time() when it started.
+                Only a full stroke, from fully open, verifies that the leaf reached its end stop,
+                and only then is the next opening stroke timed.
+        """
+        self.set_position(leaf, 0)
+        self._at_close_stop[leaf] = stroke_ms >= self._full_close_time(leaf) + self.margin
+
+    def close_time(self, leaf):
+        """
+        Returns the closing stroke a leaf needs from its estimated position in ms.
+        """
+        return self.position(leaf) * self._full_close_time(leaf) // FULLY_OPEN + self.margin
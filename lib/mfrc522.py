@@ -1,5 +1,6 @@
 from machine import Pin, SPI # type: ignore
 from os import uname
+import time
 
 """
 +----------------------------------+
@@ -17,8 +18,27 @@ from os import uname
 +------+-------------+-------------+
 
 If ESP32 is used, the SPI pins can be configured to use SPI 1 automatically.
+
+Register accesses reuse preallocated buffers, each one is a single SPI
+transaction, and the FIFO is written and read in bursts of one transaction, so
+polling for cards does not allocate on every register access.
+
+Commands wait for their completion bits in CommIrqReg/DivIrqReg. A card that
+does not answer is detected by the MFRC522 timer, which starts at the end of the
+transmission and runs for timeout_ms. The host also stops waiting at a ticks_us
+deadline, so a chip that stops answering can not hang the caller.
 """
 
+FIFO_DATA_REG = 0x09
+FIFO_SIZE = 64
+
+# The timer counts at 13.56 MHz / (2 * TIMER_PRESCALER + 1), i.e. every 0.5 ms
+TIMER_PRESCALER = 0xD3E
+TIMER_TICK_US = 500
+TIMEOUT_MS = 15  # Time a card has to answer, in ms
+DEADLINE_MARGIN_US = 5000  # Time on top of the chip timeout before the host gives up, in us
+CRC_DEADLINE_US = 5000  # Time the coprocessor has for a CRC, in us
+
 class MFRC522:
 
 	OK = 0
@@ -30,7 +50,7 @@ class MFRC522:
 	AUTHENT1A = 0x60
 	AUTHENT1B = 0x61
 
-	def __init__(self, rst, cs, sck=None, mosi=None, miso=None):
+	def __init__(self, rst, cs, sck=None, mosi=None, miso=None, timeout_ms=TIMEOUT_MS):
 
 		self.rst = Pin(25, Pin.OUT)  # Initialize RST pin
 		self.cs = Pin(27, Pin.OUT)  # Initialize CS pin
@@ -41,6 +61,14 @@ class MFRC522:
 
 		self.rst.value(0)
 		self.cs.value(1)
+
+		# Preallocated transfer buffers: one register access, and one FIFO burst plus its address byte
+		self._reg_tx = bytearray(2)
+		self._reg_rx = bytearray(2)
+		self._fifo_tx = bytearray(FIFO_SIZE + 1)
+		self._fifo_rx = bytearray(FIFO_SIZE + 1)
+		self._fifo_tx_view = memoryview(self._fifo_tx)
+		self._fifo_rx_view = memoryview(self._fifo_rx)
 		
 		# Initialize SPI based on the board type
 		board = uname()[0]
@@ -57,30 +85,62 @@ class MFRC522:
 		else:
 			raise RuntimeError("Unsupported platform")
 
+		self.timeout_ms = timeout_ms
 		self.rst.value(1)
 		self.init()
 
 	def _wreg(self, reg, val):
 
-		self.cs.value(0)
+		tx = self._reg_tx
 		# SPI write to MFRC522
 		# Byte 0
 		# Bit 7 is set to 0 for write
 		# Bit 6 to 1 is for the address
 		# Bit 0 is fixed to 0
-		self.spi.write(b'%c' % int(0xff & ((reg << 1) & 0x7e)))
-		# Byte 1 onwards is the data to write
-		self.spi.write(b'%c' % int(0xff & val))
+		tx[0] = (reg << 1) & 0x7e
+		# Byte 1 is the data to write
+		tx[1] = val & 0xff
+		self.cs.value(0)
+		self.spi.write(tx)
 		self.cs.value(1)
 
 	def _rreg(self, reg):
 
+		tx = self._reg_tx
+		tx[0] = ((reg << 1) & 0x7e) | 0x80
+		tx[1] = 0
+		self.cs.value(0)
+		# The register value is clocked out while the second byte is sent
+		self.spi.write_readinto(tx, self._reg_rx)
+		self.cs.value(1)
+
+		return self._reg_rx[1]
+
+	def _wfifo(self, data):
+
+		# Every byte after the address byte is written to the same register
+		n = len(data)
+		tx = self._fifo_tx
+		tx[0] = (FIFO_DATA_REG << 1) & 0x7e
+		for i in range(n):
+			tx[i + 1] = data[i]
 		self.cs.value(0)
-		self.spi.write(b'%c' % int(0xff & (((reg << 1) & 0x7e) | 0x80)))
-		val = self.spi.read(1)
+		self.spi.write(self._fifo_tx_view[:n + 1])
 		self.cs.value(1)
 
-		return val[0]
+	def _rfifo(self, n):
+
+		# Send the read address n times and a 0 to end, byte i + 1 of the reply is FIFO byte i
+		tx = self._fifo_tx
+		address = ((FIFO_DATA_REG << 1) & 0x7e) | 0x80
+		for i in range(n):
+			tx[i] = address
+		tx[n] = 0
+		self.cs.value(0)
+		self.spi.write_readinto(self._fifo_tx_view[:n + 1], self._fifo_rx_view[:n + 1])
+		self.cs.value(1)
+
+		return self._fifo_rx_view[1:n + 1]
 
 	def _sflags(self, reg, mask):
 		self._wreg(reg, self._rreg(reg) | mask)
@@ -106,45 +166,44 @@ class MFRC522:
 		self._sflags(0x0A, 0x80)
 		self._wreg(0x01, 0x00)
 
-		for c in send:
-			self._wreg(0x09, c)
+		self._wfifo(send)
 		self._wreg(0x01, cmd)
 
 		if cmd == 0x0C:
 			self._sflags(0x0D, 0x80)
 
-		i = 2000
+		deadline = time.ticks_add(time.ticks_us(), self.timeout_ms * 1000 + DEADLINE_MARGIN_US)
 		while True:
 			n = self._rreg(0x04)
-			i -= 1
-			if ~((i != 0) and ~(n & 0x01) and ~(n & wait_irq)):
+			if n & (wait_irq | 0x01):  # Done, or the chip timer ran out
+				break
+			if time.ticks_diff(deadline, time.ticks_us()) <= 0:
+				n = None
 				break
 
 		self._cflags(0x0D, 0x80)
 
-		if i:
-			if (self._rreg(0x06) & 0x1B) == 0x00:
-				stat = self.OK
-
-				if n & irq_en & 0x01:
-					stat = self.NOTAGERR
-				elif cmd == 0x0C:
-					n = self._rreg(0x0A)
-					lbits = self._rreg(0x0C) & 0x07
-					if lbits != 0:
-						bits = (n - 1) * 8 + lbits
-					else:
-						bits = n * 8
-
-					if n == 0:
-						n = 1
-					elif n > 16:
-						n = 16
-
-					for _ in range(n):
-						recv.append(self._rreg(0x09))
-			else:
-				stat = self.ERR
+		if n is None:
+			self._wreg(0x01, 0x00)  # Idle, stops the command
+		elif (self._rreg(0x06) & 0x1B) == 0x00:
+			stat = self.OK
+
+			if n & irq_en & 0x01:
+				stat = self.NOTAGERR
+			elif cmd == 0x0C:
+				n = self._rreg(0x0A)
+				lbits = self._rreg(0x0C) & 0x07
+				if lbits != 0:
+					bits = (n - 1) * 8 + lbits
+				else:
+					bits = n * 8
+
+				if n == 0:
+					n = 1
+				elif n > 16:
+					n = 16
+
+				recv = list(self._rfifo(n))
 
 		return stat, recv, bits
 
@@ -153,16 +212,14 @@ class MFRC522:
 		self._cflags(0x05, 0x04)
 		self._sflags(0x0A, 0x80)
 
-		for c in data:
-			self._wreg(0x09, c)
+		self._wfifo(data)
 
 		self._wreg(0x01, 0x03)
 
-		i = 0xFF
-		while True:
-			n = self._rreg(0x05)
-			i -= 1
-			if not ((i != 0) and not (n & 0x04)):
+		deadline = time.ticks_add(time.ticks_us(), CRC_DEADLINE_US)
+		while not (self._rreg(0x05) & 0x04):
+			if time.ticks_diff(deadline, time.ticks_us()) <= 0:
+				self._wreg(0x01, 0x00)  # Idle, stops the command
 				break
 
 		return [self._rreg(0x22), self._rreg(0x21)]
@@ -170,12 +227,10 @@ class MFRC522:
 	def init(self):
 
 		self.reset()
-		# defines settings for the internal timer 
-		self._wreg(0x2A, 0x8D)  # TModeReg, 0x8D
-		self._wreg(0x2B, 0x3E)  # TPrescalerReg, 0x3E
-		# defines the 16-bit timer reload value 
-		self._wreg(0x2D, 30)  # TReloadRegL, 30
-		self._wreg(0x2C, 0)  # TReloadRegH, 0
+		# defines settings for the internal timer, TAuto starts it at the end of each transmission
+		self._wreg(0x2A, 0x80 | (TIMER_PRESCALER >> 8))  # TModeReg, 0x8D
+		self._wreg(0x2B, TIMER_PRESCALER & 0xFF)  # TPrescalerReg, 0x3E
+		self.set_timeout(self.timeout_ms)
 		# setting of the transmission modulation 
 		self._wreg(0x15, 0x40)  # TxASKReg, 0x40 (Force 100% ASK modulation)
 		# defines general modes for transmitting and receiving 
@@ -183,6 +238,19 @@ class MFRC522:
 		self._sflags(0x26, 0x70) #RFCfgReg, 0x70 (Rx Gain = 48dB maximum)
 		self.antenna_on()
 
+	def set_timeout(self, timeout_ms):
+		"""
+		Sets the time a card has to answer a command, in ms.
+
+		Shorter timeouts make probes without a card shorter, but a card must
+		still answer in time: REQA answers within 0.1 ms, writes can take several ms.
+		"""
+		self.timeout_ms = timeout_ms
+		# defines the 16-bit timer reload value, the timer runs for reload + 1 ticks
+		reload = max(1, timeout_ms * 1000 // TIMER_TICK_US) - 1
+		self._wreg(0x2D, reload & 0xFF)  # TReloadRegL
+		self._wreg(0x2C, (reload >> 8) & 0xFF)  # TReloadRegH
+
 	def reset(self):
 		self._wreg(0x01, 0x0F)  # CommandReg, 0x0F (Soft Reset)
 
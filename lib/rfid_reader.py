@@ -1,21 +1,125 @@
 """
 RFID Reader abstraction using MFRC522 on SPI.
+
+The MFRC522 can not sense a card without transmitting, so cards are detected
+with short probes: the antenna is switched on, a card is requested, and the
+antenna is switched off again until the next probe. With the default period
+the reader is busy for a few ms every 100 ms and the CPU is free the rest of
+the time. Cards can be waited for in a loop, received as callbacks from a
+Timer, or awaited from an asyncio task.
 """
 
+import time
+from machine import Timer  # type: ignore
+
 from mfrc522 import MFRC522
 
+POLL_PERIOD = 100  # Time between two probes in ms
+FIELD_SETTLE_TIME = 5  # Time a card needs to power up once the antenna is on, in ms
+CARD_TIMEOUT = 3  # Time a card has to answer REQA or anticollision, in ms
+
 class RFIDReader:
     def __init__(self, cs_pin, rst_pin):
-        self.rdr = MFRC522(rst_pin, cs_pin)
+        self.rdr = MFRC522(rst_pin, cs_pin, timeout_ms=CARD_TIMEOUT)
+        self.rdr.antenna_on(False)  # Only on while probing
+        self._timer = None
+        self._callback = None
+        self._present = False
+
+    def probe(self):
+        """
+        Checks once for a card in the field.
+
+        Returns:
+            str: UID of the card as a hex string, or None if there is no card.
+        """
+        self.rdr.antenna_on()
+        time.sleep_ms(FIELD_SETTLE_TIME)
+        return self._scan()
 
-    def wait_for_card(self):
+    def _scan(self):
+        # Second half of a probe, once the field has settled: request, anticollision, antenna off
+        uid = None
+        (stat, tag_type) = self.rdr.request(self.rdr.REQIDL)
+        if stat == self.rdr.OK:
+            (stat, raw_uid) = self.rdr.anticoll()
+            if stat == self.rdr.OK:
+                uid = self._format_uid(raw_uid)
+        self.rdr.antenna_on(False)  # The card resets, so the next probe finds it idle again
+        return uid
+
+    def wait_for_card(self, idle=None, period_ms=POLL_PERIOD):
+        """
+        Blocks until a card is scanned and returns its UID as a hex string.
+
+        Args:
+            idle (function): Optional, called between two probes, e.g. to handle ESP-NOW frames.
+            period_ms (int): Time between two probes in ms.
+        """
         print("Waiting for card...")
         while True:
-            (stat, tag_type) = self.rdr.request(self.rdr.REQIDL)
-            if stat == self.rdr.OK:
-                (stat, raw_uid) = self.rdr.anticoll()
-                if stat == self.rdr.OK:
-                    return self._format_uid(raw_uid)
+            start = time.ticks_ms()
+            uid = self.probe()
+            if uid is not None:
+                return uid
+            if idle is not None:
+                idle()
+            remaining = period_ms - time.ticks_diff(time.ticks_ms(), start)
+            if remaining > 0:
+                time.sleep_ms(remaining)
+
+    def start(self, callback, period_ms=POLL_PERIOD, timer=None):
+        """
+        Probes from a periodic Timer and calls callback(uid) when a card enters the field.
+
+        A card that stays on the reader is reported once.
+
+        Args:
+            callback (function): Called with the UID hex string.
+            period_ms (int): Time between two probes in ms.
+            timer (Timer): Timer to use, Timer(1) if None.
+        """
+        self.stop()
+        self._callback = callback
+        self._present = False
+        self._timer = timer or Timer(1)
+        self._timer.init(mode=Timer.PERIODIC, period=period_ms, callback=self._poll)
+
+    def stop(self):
+        """
+        Stops the probes started by start().
+        """
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+
+    def _poll(self, timer):
+        uid = self.probe()
+        if uid is None:
+            self._present = False
+        elif not self._present:
+            self._present = True
+            self._callback(uid)
+
+    async def card(self, period_ms=POLL_PERIOD):
+        """
+        Waits for a card without blocking other asyncio tasks.
+
+        The loop is free while the field settles and between probes, only the request and
+        anticollision exchange with the chip runs without yielding.
+
+        Returns:
+            str: UID of the card as a hex string.
+        """
+        import asyncio  # type: ignore
+
+        while True:
+            self.rdr.antenna_on()
+            await asyncio.sleep_ms(FIELD_SETTLE_TIME)  # Other tasks run while the card powers up
+            uid = self._scan()
+            if uid is not None:
+                return uid
+            await asyncio.sleep_ms(max(period_ms - FIELD_SETTLE_TIME, 0))
 
     def _format_uid(self, raw_uid):
         return "0x" + "".join("{:02X}".format(i) for i in raw_uid)
@@ -1,4 +1,7 @@
 # MicroPython SSD1306 OLED driver, I2C and SPI interfaces
+#
+# Command sequences are sent with write_cmds() as one transfer: over I2C a
+# single control byte with Co=0, D/C#=0 is followed by all the command bytes.
 
 from micropython import const
 import framebuf
@@ -32,11 +35,17 @@ class SSD1306(framebuf.FrameBuffer):
         self.external_vcc = external_vcc
         self.pages = self.height // 8
         self.buffer = bytearray(self.pages * self.width)
+        # Copy of the display RAM, show() only sends the bytes that differ from it
+        self.sent = bytearray(self.pages * self.width)
+        self.sent_valid = False
+        self.window = bytearray(6)  # Column and page address commands of show()
+        self._buffer_view = memoryview(self.buffer)
+        self._sent_view = memoryview(self.sent)
         super().__init__(self.buffer, self.width, self.height, framebuf.MONO_VLSB)
         self.init_display()
 
     def init_display(self):
-        for cmd in (
+        self.write_cmds(bytes((
             SET_DISP | 0x00,  # off
             # address setting
             SET_MEM_ADDR,
@@ -66,11 +75,10 @@ class SSD1306(framebuf.FrameBuffer):
             # charge pump
             SET_CHARGE_PUMP,
             0x10 if self.external_vcc else 0x14,
-            SET_DISP | 0x01,
-        ):  # on
-            self.write_cmd(cmd)
+            SET_DISP | 0x01,  # on
+        )))
         self.fill(0)
-        self.show()
+        self.show(full=True)
 
     def poweroff(self):
         self.write_cmd(SET_DISP | 0x00)
@@ -79,26 +87,55 @@ class SSD1306(framebuf.FrameBuffer):
         self.write_cmd(SET_DISP | 0x01)
 
     def contrast(self, contrast):
-        self.write_cmd(SET_CONTRAST)
-        self.write_cmd(contrast)
+        self.write_cmds(bytes((SET_CONTRAST, contrast)))
 
     def invert(self, invert):
         self.write_cmd(SET_NORM_INV | (invert & 1))
 
-    def show(self):
-        x0 = 0
-        x1 = self.width - 1
+    def show(self, full=False):
+        """
+        Sends the framebuffer to the display.
+
+        Only the columns that changed since the last show() are sent, one
+        window per changed page. full=True sends the whole buffer.
+        """
+        width = self.width
+        if full or not self.sent_valid:
+            self.write_window(0, width - 1, 0, self.pages - 1, self.buffer)
+            self.sent[:] = self.buffer
+            self.sent_valid = True
+            return
+        buf = self.buffer
+        sent = self.sent
+        view = self._buffer_view
+        for page in range(self.pages):
+            start = page * width
+            end = start + width
+            # Compared byte by byte, slices of the page would allocate on every show()
+            while start < end and buf[start] == sent[start]:
+                start += 1
+            if start == end:
+                continue  # Page unchanged
+            while buf[end - 1] == sent[end - 1]:
+                end -= 1
+            x0 = start - page * width
+            self.write_window(x0, x0 + end - start - 1, page, page, view[start:end])
+            self._sent_view[start:end] = view[start:end]
+
+    def write_window(self, x0, x1, page0, page1, buf):
         if self.width == 64:
             # displays with width of 64 pixels are shifted by 32
             x0 += 32
             x1 += 32
-        self.write_cmd(SET_COL_ADDR)
-        self.write_cmd(x0)
-        self.write_cmd(x1)
-        self.write_cmd(SET_PAGE_ADDR)
-        self.write_cmd(0)
-        self.write_cmd(self.pages - 1)
-        self.write_data(self.buffer)
+        cmds = self.window
+        cmds[0] = SET_COL_ADDR
+        cmds[1] = x0
+        cmds[2] = x1
+        cmds[3] = SET_PAGE_ADDR
+        cmds[4] = page0
+        cmds[5] = page1
+        self.write_cmds(cmds)
+        self.write_data(buf)
 
 
 class SSD1306_I2C(SSD1306):
@@ -106,6 +143,7 @@ class SSD1306_I2C(SSD1306):
         self.i2c = i2c
         self.addr = addr
         self.temp = bytearray(2)
+        self.cmd_list = [b"\x00", None]  # Co=0, D/C#=0
         self.write_list = [b"\x40", None]  # Co=0, D/C#=1
         super().__init__(width, height, external_vcc)
 
@@ -114,6 +152,10 @@ class SSD1306_I2C(SSD1306):
         self.temp[1] = cmd
         self.i2c.writeto(self.addr, self.temp)
 
+    def write_cmds(self, cmds):
+        self.cmd_list[1] = cmds
+        self.i2c.writevto(self.addr, self.cmd_list)
+
     def write_data(self, buf):
         self.write_list[1] = buf
         self.i2c.writevto(self.addr, self.write_list)
@@ -146,6 +188,14 @@ class SSD1306_SPI(SSD1306):
         self.spi.write(bytearray([cmd]))
         self.cs(1)
 
+    def write_cmds(self, cmds):
+        self.spi.init(baudrate=self.rate, polarity=0, phase=0)
+        self.cs(1)
+        self.dc(0)
+        self.cs(0)
+        self.spi.write(cmds)
+        self.cs(1)
+
     def write_data(self, buf):
         self.spi.init(baudrate=self.rate, polarity=0, phase=0)
         self.cs(1)
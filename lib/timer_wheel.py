@@ -0,0 +1,175 @@
+"""
+timer_wheel.py
+
+Software timer wheel that runs any number of one-shot and periodic deadlines
+from a single machine.Timer. The ESP32 only has four hardware timers, so the
+gate controller keeps all of its timers on one wheel.
+
+Each SoftTimer has the same init()/deinit() interface as machine.Timer.
+Scheduling and cancelling are O(1): timers are kept in doubly linked lists,
+one per wheel slot, and a tick only visits the timers of the current slot.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+from machine import Timer  # type: ignore
+import time
+
+
+class SoftTimer:
+    """
+    A timer that lives on a TimerWheel.
+
+    Attributes:
+        wheel (TimerWheel): Wheel that runs this timer.
+    """
+
+    ONE_SHOT = Timer.ONE_SHOT
+    PERIODIC = Timer.PERIODIC
+
+    def __init__(self, wheel):
+        self.wheel = wheel
+        self._callback = None
+        self._mode = Timer.ONE_SHOT
+        self._ticks = 0
+        self._rounds = 0
+        self._slot = -1  # -1 when not on the wheel
+        self._prev = None
+        self._next = None
+        self._due = False  # True while waiting in the due chain of a tick
+        self._due_next = None
+
+    def init(self, mode=Timer.PERIODIC, period=-1, callback=None):
+        """
+        Starts the timer, replacing any previous deadline.
+
+        Args:
+            mode: Timer.ONE_SHOT or Timer.PERIODIC.
+            period (int): Period in ms, rounded up to whole wheel ticks.
+            callback (function): Called with this timer when it expires.
+        """
+        self.deinit()
+        self._mode = mode
+        self._callback = callback
+        self._ticks = max(1, (period + self.wheel.tick_ms - 1) // self.wheel.tick_ms)
+        self.wheel._insert(self)
+
+    def deinit(self):
+        """
+        Stops the timer. Stopping an idle timer is harmless.
+        """
+        if self._slot >= 0:
+            self.wheel._remove(self)
+        self._due = False
+
+    def active(self):
+        """
+        Returns True if the timer is waiting to expire.
+        """
+        return self._slot >= 0 or self._due
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel driven by one periodic hardware timer.
+
+    Attributes:
+        tick_ms (int): Wheel resolution in ms.
+        size (int): Number of slots. Deadlines longer than size ticks wrap around in rounds.
+    """
+
+    def __init__(self, hw_timer=None, tick_ms=10, size=64):
+        """
+        Initializes the wheel.
+
+        Args:
+            hw_timer (Timer): Hardware timer that drives the wheel, or None to call tick() yourself.
+            tick_ms (int): Wheel resolution in ms.
+            size (int): Number of slots.
+        """
+        self.tick_ms = tick_ms
+        self.size = size
+        self._heads = [None] * size
+        self._cursor = 0
+        self._hw_timer = hw_timer
+        self._next_tick = 0
+
+    def timer(self):
+        """
+        Returns a new SoftTimer on this wheel.
+        """
+        return SoftTimer(self)
+
+    def start(self):
+        """
+        Starts driving the wheel from the hardware timer.
+        """
+        self._next_tick = time.ticks_add(time.ticks_ms(), self.tick_ms)
+        self._hw_timer.init(mode=Timer.PERIODIC, period=self.tick_ms, callback=self._hw_tick)
+
+    def stop(self):
+        """
+        Stops the hardware timer. Pending deadlines are kept.
+        """
+        self._hw_timer.deinit()
+
+    def _hw_tick(self, hw_timer):
+        # Timer callbacks can run late, catch up on every tick that has passed
+        now = time.ticks_ms()
+        while time.ticks_diff(now, self._next_tick) >= 0:
+            self._next_tick = time.ticks_add(self._next_tick, self.tick_ms)
+            self.tick()
+
+    def _insert(self, t):
+        ticks = t._ticks
+        slot = (self._cursor + ticks) % self.size
+        t._rounds = (ticks - 1) // self.size
+        t._slot = slot
+        t._prev = None
+        t._next = self._heads[slot]
+        if t._next is not None:
+            t._next._prev = t
+        self._heads[slot] = t
+
+    def _remove(self, t):
+        if t._prev is not None:
+            t._prev._next = t._next
+        else:
+            self._heads[t._slot] = t._next
+        if t._next is not None:
+            t._next._prev = t._prev
+        t._prev = t._next = None
+        t._slot = -1
+
+    def tick(self):
+        """
+        Advances the wheel by one tick and runs the timers that expire.
+        """
+        self._cursor = (self._cursor + 1) % self.size
+
+        # Move the expired timers to a due chain first, so callbacks can freely start and stop timers
+        due = None
+        t = self._heads[self._cursor]
+        while t is not None:
+            following = t._next
+            if t._rounds > 0:
+                t._rounds -= 1
+            else:
+                self._remove(t)
+                t._due = True
+                t._due_next = due
+                due = t
+            t = following
+
+        while due is not None:
+            t = due
+            due = t._due_next
+            t._due_next = None
+            if not t._due:
+                continue  # Stopped by an earlier callback of this tick
+            t._due = False
+            if t._mode == Timer.PERIODIC:
+                self._insert(t)
+            if t._callback is not None:
+                t._callback(t)
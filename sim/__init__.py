@@ -0,0 +1,12 @@
+"""
+Host-side simulator for the gate system boards.
+
+Runs the MicroPython board scripts unmodified on CPython against fake
+`machine`, `network` and `espnow` modules driven by a deterministic virtual
+clock. See sim/__main__.py for an example of a full gate cycle.
+"""
+
+from .clock import VirtualClock
+from .board import Board
+from .plant import SwingLeaf
+from .gate import GateRig
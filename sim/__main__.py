@@ -0,0 +1,40 @@
+"""
+Runs open/close cycles of src/gate_controller.py in virtual time.
+
+Usage:
+    python -m sim [--cycles N] [--break-at MS] [--script PATH]
+"""
+
+import argparse
+import time
+
+from .gate import GateRig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate gate controller cycles.")
+    parser.add_argument("--cycles", type=int, default=1, help="number of open/close cycles")
+    parser.add_argument("--break-at", type=int, default=None, help="pulse the break sensor this many ms after each open command")
+    parser.add_argument("--script", default="src/gate_controller.py", help="controller script to run")
+    args = parser.parse_args()
+
+    try:
+        rig = GateRig(script=args.script)
+    except NotImplementedError as e:
+        parser.exit(2, "%s\n" % e)
+    wall_start = time.perf_counter()
+    virtual_start = rig.board.now_ms
+    for n in range(args.cycles):
+        result = rig.cycle(break_at_ms=args.break_at)
+        if n < 5 or n == args.cycles - 1:
+            print("cycle %d: %s" % (n + 1, result))
+    wall_ms = (time.perf_counter() - wall_start) * 1000
+    virtual_ms = rig.board.now_ms - virtual_start
+    print(
+        "%d cycles, %.0f s virtual in %.0f ms wall (x%.0f)"
+        % (args.cycles, virtual_ms / 1000, wall_ms, virtual_ms / max(wall_ms, 1e-3))
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+board.py
+
+Runs a board script unmodified on CPython against the fake hardware. The Board
+owns the virtual clock, the pin levels and the recorded relay and radio traces.
+
+Only one board can be loaded per process at a time, because the fake modules
+are installed in sys.modules and the board's flash is the working directory.
+
+Scripts built on asyncio (e.g. src/gate_controller_async.py) are not supported:
+there is no event loop driven by the virtual clock, and the fake time module
+would break CPython's own asyncio.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import ast
+import bisect
+import importlib
+import os
+import sys
+import tempfile
+
+from .clock import VirtualClock
+from .hardware import make_machine, make_micropython, make_time, make_os
+from .radio import make_network, make_espnow
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIB_DIR = os.path.join(REPO_ROOT, "lib")
+SHADOWED_MODULES = ("time", "os")  # Fakes of CPython modules, only installed while board code loads
+UNSUPPORTED_MODULES = ("asyncio", "uasyncio", "aioespnow")  # No virtual-clock event loop to run them on
+
+
+def unsupported_imports(source):
+    """
+    Returns the modules imported by a script that the simulator can not provide.
+    """
+    found = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module or ""]
+        else:
+            continue
+        for name in names:
+            if name.split(".")[0] in UNSUPPORTED_MODULES and name not in found:
+                found.append(name)
+    return found
+
+
+class Board:
+    """
+    A simulated ESP32 board.
+
+    Attributes:
+        clock (VirtualClock): Virtual time source.
+        mac (bytes): MAC address of the board's Wi-Fi interface.
+        pins (dict): Current level of every pin by pin number.
+        trace (list): (time_us, pin, value) for every output level change.
+        sent (list): (time_us, mac, msg) for every ESP-NOW frame sent by the board.
+        namespace (dict): Globals of the running script.
+        flash_dir (str): Directory that stands in for the board's flash file system.
+    """
+
+    def __init__(self, mac=b"\x02\x00\x00\x00\x00\x01", clock=None, flash_dir=None):
+        self.clock = clock or VirtualClock()
+        self.flash_dir = flash_dir or tempfile.mkdtemp(prefix="sim_flash_")
+        self.mac = mac
+        self.pins = {}
+        self.irqs = {}
+        self.trace = []
+        self.sent = []
+        self.i2c_log = []
+        self.spi_log = []
+        self.i2c_devices = {0x3C}  # SSD1306
+        self.spi_devices = {}
+        self.stations = []
+        self.espnow = None
+        self.namespace = None
+        self._inputs = set()
+        self._watchers = {}
+        self._peer_acks = {}
+        self.modules = {
+            "machine": make_machine(self),
+            "micropython": make_micropython(self),
+            "time": make_time(self),
+            "os": make_os(self),
+            "network": make_network(self),
+            "espnow": make_espnow(self),
+        }
+
+    # Running scripts
+
+    def _purge_repo_modules(self):
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None) or ""
+            if path.startswith(REPO_ROOT) and not name.startswith("sim"):
+                del sys.modules[name]
+
+    def run(self, script):
+        """
+        Loads a board script and runs its top level code.
+
+        Args:
+            script (str): Path of the script, relative to the repository root or absolute.
+        Returns:
+            dict: Globals of the script.
+        Raises:
+            NotImplementedError: If the script imports asyncio or aioespnow.
+        """
+        path = script if os.path.isabs(script) else os.path.join(REPO_ROOT, script)
+        with open(path) as f:
+            source = f.read()
+        unsupported = unsupported_imports(source)
+        if unsupported:
+            raise NotImplementedError(
+                "%s is not supported by the simulator: it imports %s" % (script, ", ".join(unsupported))
+            )
+        self._install()
+        try:
+            code = compile(source, path, "exec")
+            self.namespace = {"__name__": "__main__", "__file__": path}
+            exec(code, self.namespace)
+        finally:
+            self._restore()
+        return self.namespace
+
+    def load(self, name):
+        """
+        Imports a module from lib/ against the fake hardware, e.g. a driver to exercise on its own.
+
+        Args:
+            name (str): Module name.
+        Returns:
+            module: The imported module.
+        """
+        self._install()
+        try:
+            return importlib.import_module(name)
+        finally:
+            self._restore()
+
+    def _install(self):
+        for entry in (LIB_DIR, REPO_ROOT):
+            if entry not in sys.path:
+                sys.path.insert(0, entry)
+        self._purge_repo_modules()
+        os.chdir(self.flash_dir)
+        self._real = {name: sys.modules.get(name) for name in SHADOWED_MODULES}
+        sys.modules.update(self.modules)
+
+    def _restore(self):
+        # The rest of CPython keeps the real time and os modules
+        sys.modules.update(self._real)
+
+    def __getitem__(self, name):
+        return self.namespace[name]
+
+    # Pins
+
+    def write_pin(self, pin, value):
+        """
+        Called by the fake Pin when the script drives a pin.
+        """
+        if pin in self._inputs:
+            return
+        if self.pins.get(pin) != value:
+            self.pins[pin] = value
+            self.trace.append((self.clock.now_us, pin, value))
+            for watcher in self._watchers.get(pin, ()):
+                watcher(pin, value)
+
+    def watch(self, pin, callback):
+        """
+        Calls callback(pin, value) whenever the script changes an output pin.
+        """
+        self._watchers.setdefault(pin, []).append(callback)
+
+    def set_input(self, pin, value):
+        """
+        Drives an input pin from the outside and fires its IRQ on a matching edge.
+
+        Args:
+            pin (int): Pin number.
+            value (int): New level.
+        """
+        self._inputs.add(pin)
+        old = self.pins.get(pin, 0)
+        self.pins[pin] = value
+        if old == value:
+            return
+        irq = self.irqs.get(pin)
+        if irq is None:
+            return
+        trigger, handler, pin_obj = irq
+        rising = 1 if value else 2  # Pin.IRQ_RISING / Pin.IRQ_FALLING
+        if trigger & rising:
+            handler(pin_obj)
+
+    def set_input_later(self, delay_ms, pin, value):
+        """
+        Schedules set_input() on the virtual clock.
+        """
+        return self.clock.call_later(delay_ms, self.set_input, pin, value)
+
+    def pulse(self, pin, width_ms=100):
+        """
+        Drives an input pin high now and low again after width_ms.
+        """
+        self.set_input(pin, 1)
+        self.set_input_later(width_ms, pin, 0)
+
+    def level(self, pin):
+        return self.pins.get(pin, 0)
+
+    def edges(self, pin, since_us=0):
+        """
+        Returns the (time_us, value) level changes of an output pin since a time.
+        """
+        start = bisect.bisect_left(self.trace, (since_us,))
+        return [(t, v) for t, p, v in self.trace[start:] if p == pin]
+
+    def first_edge(self, pin, value, since_us=0):
+        """
+        Returns the time in us of the first change of a pin to a value since a time, or None.
+        """
+        for t, v in self.edges(pin, since_us):
+            if v == value:
+                return t
+        return None
+
+    # ESP-NOW
+
+    def receive(self, mac, msg, delay_ms=0):
+        """
+        Delivers an ESP-NOW frame to the board after a delay.
+        """
+        return self.clock.call_later(delay_ms, self._deliver, bytes(mac), bytes(msg))
+
+    def _deliver(self, mac, msg):
+        if self.espnow is not None:
+            self.espnow.deliver(mac, msg)
+
+    def set_peer_ack(self, mac, acked):
+        """
+        Chooses whether frames sent to a peer are acknowledged.
+        """
+        self._peer_acks[bytes(mac)] = acked
+
+    def transmit(self, mac, msg, sync):
+        """
+        Called by the fake ESPNow for every frame the script sends.
+        """
+        self.sent.append((self.clock.now_us, mac, msg))
+        return self._peer_acks.get(mac, True)
+
+    # Time
+
+    def advance(self, ms):
+        self.clock.advance(ms)
+
+    @property
+    def now_ms(self):
+        return self.clock.now_ms
@@ -0,0 +1,130 @@
+"""
+clock.py
+
+Deterministic virtual clock for the host-side simulator. Time only moves when
+the simulation advances it, and scheduled callbacks run in due order.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import heapq
+
+TICKS_PERIOD = 1 << 30  # MicroPython ticks wrap at 2**30 on the ESP32
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+
+class VirtualClock:
+    """
+    Virtual time source with a callback queue.
+
+    Attributes:
+        now_us (int): Current virtual time in microseconds.
+    """
+
+    def __init__(self):
+        self.now_us = 0
+        self._queue = []
+        self._seq = 0
+
+    @property
+    def now_ms(self):
+        return self.now_us // 1000
+
+    def call_at(self, due_us, callback, *args):
+        """
+        Schedules a callback at an absolute virtual time.
+
+        Args:
+            due_us (int): Time in microseconds at which the callback runs.
+            callback (function): Function to call.
+            *args: Arguments passed to the callback.
+        Returns:
+            list: Handle that can be passed to cancel().
+        """
+        self._seq += 1
+        entry = [max(due_us, self.now_us), self._seq, callback, args]
+        heapq.heappush(self._queue, entry)
+        return entry
+
+    def call_later(self, delay_ms, callback, *args):
+        """
+        Schedules a callback after a delay in milliseconds.
+        """
+        return self.call_at(self.now_us + int(delay_ms * 1000), callback, *args)
+
+    def cancel(self, handle):
+        """
+        Cancels a scheduled callback. Cancelling twice is harmless.
+        """
+        if handle is not None:
+            handle[2] = None
+
+    def next_due(self):
+        """
+        Returns the time in microseconds of the next pending callback, or None.
+        """
+        while self._queue and self._queue[0][2] is None:
+            heapq.heappop(self._queue)
+        return self._queue[0][0] if self._queue else None
+
+    def run_until(self, until_us, stop=None):
+        """
+        Runs every callback due up to a time, then moves the clock to that time.
+
+        Args:
+            until_us (int): Time in microseconds to run to.
+            stop (function): Optional predicate checked after each callback. Returns early when it is True.
+        Returns:
+            bool: True if stopped early by the predicate.
+        """
+        while True:
+            due = self.next_due()
+            if due is None or due > until_us:
+                break
+            _, _, callback, args = heapq.heappop(self._queue)
+            self.now_us = max(self.now_us, due)
+            callback(*args)
+            if stop is not None and stop():
+                return True
+        self.now_us = max(self.now_us, until_us)
+        return False
+
+    def advance(self, ms):
+        """
+        Advances the clock by a number of milliseconds, running every callback that becomes due.
+        """
+        self.run_until(self.now_us + int(ms * 1000))
+
+    # MicroPython time API
+
+    def ticks_ms(self):
+        return self.now_ms & _TICKS_MAX
+
+    def ticks_us(self):
+        return self.now_us & _TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.now_us & _TICKS_MAX
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & _TICKS_MAX
+
+    @staticmethod
+    def ticks_diff(end, start):
+        return ((end - start + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+    def sleep_us(self, us):
+        # A blocking sleep on the board: time passes but nothing else gets to run.
+        self.now_us += int(us)
+
+    def sleep_ms(self, ms):
+        self.sleep_us(int(ms) * 1000)
+
+    def sleep(self, seconds):
+        self.sleep_us(int(seconds * 1000000))
+
+    def time(self):
+        return self.now_us // 1000000
@@ -0,0 +1,103 @@
+"""
+gate.py
+
+Simulation rig for src/gate_controller.py: the controller board, two swing
+leaves wired to its relays and helpers to run and measure open/close cycles.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+from .board import Board
+from .plant import SwingLeaf
+
+# Same wiring as src/gate_controller.py
+K1_MOTOR_1 = 33
+K2_MOTOR_1 = 25
+K4_MOTOR_2 = 26
+K3_MOTOR_2 = 27
+GATE_1_OPEN_SENSOR_PIN = 36
+GATE_2_OPEN_SENSOR_PIN = 39
+BREAK_SENSOR_PIN = 34
+
+REMOTE_MAC = b"\x02\x00\x00\x00\x00\x02"
+
+
+class GateRig:
+    """
+    Gate controller board with two simulated leaves.
+
+    Attributes:
+        board (Board): Simulated controller board.
+        leaves (tuple): The two SwingLeaf models.
+    """
+
+    def __init__(
+        self,
+        script="src/gate_controller.py",
+        open_times_ms=(10500, 11800),
+        close_times_ms=(11000, 12300),
+    ):
+        self.board = Board(mac=b"\xc8\x2e\x18\x51\xc8\x5c")
+        self.leaves = (
+            SwingLeaf(self.board, K1_MOTOR_1, K2_MOTOR_1, GATE_1_OPEN_SENSOR_PIN, open_times_ms[0], close_times_ms[0]),
+            SwingLeaf(self.board, K4_MOTOR_2, K3_MOTOR_2, GATE_2_OPEN_SENSOR_PIN, open_times_ms[1], close_times_ms[1]),
+        )
+        self.board.set_input(BREAK_SENSOR_PIN, 0)
+        self.board.run(script)
+
+    def open_command(self, msg=b"\x01", mac=REMOTE_MAC):
+        """
+        Sends the ESP-NOW open command to the controller now.
+        """
+        self.board.receive(mac, msg)
+
+    def closed(self):
+        """
+        Returns True if both leaves are closed and both motors are off.
+        """
+        board = self.board
+        gates = board["gates"]
+        return gates.all_in(0) and not board.level(K1_MOTOR_1) and not board.level(K4_MOTOR_2)
+
+    def run_until_closed(self, limit_ms=120000, step_ms=100):
+        """
+        Advances the clock until the gate is closed again.
+
+        Returns:
+            int: Virtual time in ms spent, or -1 if the limit was reached.
+        """
+        start = self.board.now_ms
+        while self.board.now_ms - start < limit_ms:
+            self.board.advance(step_ms)
+            if self.closed():
+                return self.board.now_ms - start
+        return -1
+
+    def cycle(self, break_at_ms=None):
+        """
+        Runs one open/close cycle started by an ESP-NOW open command.
+
+        Args:
+            break_at_ms (int): Optional time after the command at which the break sensor is pulsed.
+        Returns:
+            dict: Latency from the command to each motor start in ms, cycle time in ms and end stop stall time in ms.
+        """
+        board = self.board
+        start_us = board.clock.now_us
+        stall_before = [leaf.stall_ms for leaf in self.leaves]
+        self.open_command()
+        if break_at_ms is not None:
+            board.clock.call_later(break_at_ms, board.pulse, BREAK_SENSOR_PIN, 200)
+        cycle_ms = self.run_until_closed()
+        for leaf in self.leaves:
+            leaf.update()
+        latency = []
+        for pin in (K1_MOTOR_1, K4_MOTOR_2):
+            edge = board.first_edge(pin, 1, start_us)
+            latency.append(None if edge is None else (edge - start_us) / 1000)
+        return {
+            "latency_ms": latency,
+            "cycle_ms": cycle_ms,
+            "stall_ms": [leaf.stall_ms - before for leaf, before in zip(self.leaves, stall_before)],
+        }
@@ -0,0 +1,249 @@
+"""
+hardware.py
+
+Fake `machine`, `micropython`, `time` and `os` modules for the host-side simulator.
+Every class is bound to a Board, which owns the pin levels, the virtual clock
+and the recorded traces.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import os
+import types
+
+ESP32_TIMER_IDS = (0, 1, 2, 3)  # The ESP32 port only has the four hardware timers
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_DOWN = 1
+    PULL_UP = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    board = None  # Set by make_machine()
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = None
+        self.board.pins.setdefault(id, 0)
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            self.mode = mode
+        if value is not None:
+            self.value(value)
+
+    def value(self, value=None):
+        if value is None:
+            return self.board.pins[self.id]
+        self.board.write_pin(self.id, 1 if value else 0)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        if handler is None or trigger == 0:
+            self.board.irqs.pop(self.id, None)
+        else:
+            self.board.irqs[self.id] = (trigger, handler, self)
+
+    def __repr__(self):
+        return "Pin(%d)" % self.id
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    board = None  # Set by make_machine()
+
+    def __init__(self, id, **kwargs):
+        if id not in ESP32_TIMER_IDS:
+            raise ValueError("invalid Timer number")
+        self.id = id
+        self._handle = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, callback=None, freq=-1):
+        self.deinit()
+        if freq > 0:
+            period = 1000 / freq
+        self._mode = mode
+        self._period = period
+        self._callback = callback
+        self._handle = self.board.clock.call_later(period, self._fire)
+
+    def _fire(self):
+        if self._mode == Timer.PERIODIC:
+            self._handle = self.board.clock.call_later(self._period, self._fire)
+        else:
+            self._handle = None
+        if self._callback is not None:
+            self._callback(self)
+
+    def deinit(self):
+        self.board.clock.cancel(self._handle)
+        self._handle = None
+
+    def __repr__(self):
+        return "Timer(%d)" % self.id
+
+
+class SPI:
+    MSB = 0
+    LSB = 1
+
+    board = None  # Set by make_machine()
+
+    def __init__(self, id, *args, **kwargs):
+        self.id = id
+        self.baudrate = 1000000
+        self.init(*args, **kwargs)
+
+    def init(self, *args, baudrate=None, **kwargs):
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+    def _transfer(self, tx):
+        self.board.clock.sleep_us(len(tx) * 8 * 1000000 // self.baudrate)
+        self.board.spi_log.append((self.board.clock.now_us, self.id, len(tx)))
+        device = self.board.spi_devices.get(self.id)
+        return device(bytes(tx)) if device is not None else bytes(len(tx))
+
+    def read(self, nbytes, write=0x00):
+        return self._transfer(bytes([write]) * nbytes)
+
+    def readinto(self, buf, write=0x00):
+        buf[:] = self._transfer(bytes([write]) * len(buf))
+
+    def write(self, buf):
+        self._transfer(buf)
+
+    def write_readinto(self, write_buf, read_buf):
+        read_buf[:] = self._transfer(write_buf)
+
+    def deinit(self):
+        pass
+
+
+class I2C:
+    board = None  # Set by make_machine()
+
+    def __init__(self, id, scl=None, sda=None, freq=400000, timeout=50000):
+        self.id = id
+        self.freq = freq
+
+    def init(self, scl=None, sda=None, freq=400000, timeout=50000):
+        self.freq = freq
+
+    def _transfer(self, addr, nbytes):
+        # Start + address byte + data bytes + stop, 9 clocks per byte
+        self.board.clock.sleep_us((nbytes + 1) * 9 * 1000000 // self.freq + 10)
+        self.board.i2c_log.append((self.board.clock.now_us, self.id, addr, nbytes))
+
+    def scan(self):
+        return sorted(self.board.i2c_devices)
+
+    def writeto(self, addr, buf, stop=True):
+        self._transfer(addr, len(buf))
+        return len(buf) if addr in self.board.i2c_devices else 0
+
+    def writevto(self, addr, vector, stop=True):
+        self._transfer(addr, sum(len(buf) for buf in vector))
+        return len(vector) if addr in self.board.i2c_devices else 0
+
+    def readfrom(self, addr, nbytes, stop=True):
+        self._transfer(addr, nbytes)
+        return bytes(nbytes)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        self._transfer(addr, len(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        self._transfer(addr, nbytes + 1)
+        return bytes(nbytes)
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self._transfer(addr, len(buf) + 1)
+
+
+def make_machine(board):
+    """
+    Builds a `machine` module whose classes are bound to a board.
+    """
+    module = types.ModuleType("machine")
+    for cls in (Pin, Timer, SPI, I2C):
+        setattr(module, cls.__name__, type(cls.__name__, (cls,), {"board": board}))
+    module.freq = lambda hz=None: 240000000
+    module.unique_id = lambda: board.mac
+    module.idle = lambda: None
+    module.disable_irq = lambda: 0
+    module.enable_irq = lambda state=0: None
+
+    def reset():
+        raise SystemExit("machine.reset()")
+
+    module.reset = reset
+    return module
+
+
+def make_micropython(board):
+    """
+    Builds a `micropython` module. schedule() runs the function at the current virtual time.
+    """
+    module = types.ModuleType("micropython")
+    module.const = lambda value: value
+    module.alloc_emergency_exception_buf = lambda size: None
+    module.mem_info = lambda *args: None
+
+    def schedule(function, arg):
+        board.clock.call_at(board.clock.now_us, function, arg)
+
+    module.schedule = schedule
+    return module
+
+
+def make_time(board):
+    """
+    Builds a MicroPython `time` module driven by the board's virtual clock.
+    """
+    clock = board.clock
+    module = types.ModuleType("time")
+    for name in (
+        "ticks_ms",
+        "ticks_us",
+        "ticks_cpu",
+        "ticks_add",
+        "ticks_diff",
+        "sleep",
+        "sleep_ms",
+        "sleep_us",
+        "time",
+    ):
+        setattr(module, name, getattr(clock, name))
+    module.time_ns = lambda: clock.now_us * 1000
+    return module
+
+
+def make_os(board):
+    """
+    Builds an `os` module that reports an ESP32 from uname() and is the host's os otherwise,
+    so the board's flash is the working directory.
+    """
+    module = types.ModuleType("os")
+    module.__dict__.update(os.__dict__)
+    module.__name__ = "os"
+    uname = ("esp32", "esp32", "1.24.0", "v1.24.0 on 2024-10-25", "Generic ESP32 module with ESP32")
+    module.uname = lambda: uname
+    return module
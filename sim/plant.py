@@ -0,0 +1,104 @@
+"""
+plant.py
+
+Model of a swing gate leaf for the simulator. It follows the enable and
+direction relays of a leaf, moves a position between 0 (closed) and 1 (opened)
+and drives the leaf's open sensor.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+
+class SwingLeaf:
+    """
+    Simulated leaf driven by a pair of relays.
+
+    Attributes:
+        position (float): 0.0 is closed, 1.0 is fully opened.
+        stall_ms (int): Total time the motor was on while pushing against an end stop.
+    """
+
+    def __init__(self, board, enable_pin, direction_pin, open_sensor_pin, open_time_ms, close_time_ms, open_direction=1):
+        """
+        Args:
+            board (Board): Board the relays are connected to.
+            enable_pin (int): Motor on/off relay.
+            direction_pin (int): Motor direction relay.
+            open_sensor_pin (int): Input pin of the leaf open sensor.
+            open_time_ms (int): Full opening stroke in ms.
+            close_time_ms (int): Full closing stroke in ms.
+            open_direction (int): Level of the direction relay that opens the leaf.
+        """
+        self.board = board
+        self.enable_pin = enable_pin
+        self.direction_pin = direction_pin
+        self.open_sensor_pin = open_sensor_pin
+        self.open_time_ms = open_time_ms
+        self.close_time_ms = close_time_ms
+        self.open_direction = open_direction
+        self.position = 0.0
+        self.stall_ms = 0
+        self._since_us = board.clock.now_us
+        self._speed = 0.0
+        self._arrival = None
+        board.watch(enable_pin, self._relay_changed)
+        board.watch(direction_pin, self._relay_changed)
+        board.set_input(open_sensor_pin, 0)
+
+    def _velocity(self):
+        # Position per microsecond
+        if not self.board.level(self.enable_pin):
+            return 0.0
+        if self.board.level(self.direction_pin) == self.open_direction:
+            return 1.0 / (self.open_time_ms * 1000)
+        return -1.0 / (self.close_time_ms * 1000)
+
+    def _integrate(self):
+        # The relays may have just changed, so use the velocity from before the change
+        now = self.board.clock.now_us
+        velocity = self._speed
+        elapsed = now - self._since_us
+        self._since_us = now
+        if velocity == 0.0:
+            return
+        position = self.position + velocity * elapsed
+        if position > 1.0:
+            self.stall_ms += (position - 1.0) / velocity / 1000
+            position = 1.0
+        elif position < 0.0:
+            self.stall_ms += position / velocity / 1000
+            position = 0.0
+        self.position = position
+
+    def _relay_changed(self, pin, value):
+        self._integrate()
+        self.board.clock.cancel(self._arrival)
+        self._arrival = None
+        velocity = self._speed = self._velocity()
+        if velocity < 0.0 and self.position < 1.0:
+            self.board.set_input(self.open_sensor_pin, 0)
+        elif velocity < 0.0:
+            # Leaves the open sensor almost immediately
+            self._arrival = self.board.clock.call_later(50, self._left_open)
+        elif velocity > 0.0 and self.position < 1.0:
+            remaining_us = (1.0 - self.position) / velocity
+            self._arrival = self.board.clock.call_at(self.board.clock.now_us + int(remaining_us), self._reached_open)
+
+    def _reached_open(self):
+        self._integrate()
+        self.position = 1.0
+        self._arrival = None
+        self.board.set_input(self.open_sensor_pin, 1)
+
+    def _left_open(self):
+        self._integrate()
+        self._arrival = None
+        self.board.set_input(self.open_sensor_pin, 0)
+
+    def update(self):
+        """
+        Brings position and stall time up to the current virtual time.
+        """
+        self._integrate()
+        return self.position
@@ -0,0 +1,197 @@
+"""
+radio.py
+
+Fake `network` and `espnow` modules for the host-side simulator. Frames sent by
+the board are recorded on the Board, and frames injected by the simulation are
+delivered through the virtual clock like the real receive interrupt.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import types
+
+BROADCAST_MAC = b"\xff" * 6
+ESPNOW_MAX_DATA_LEN = 250
+
+
+class WLAN:
+    board = None  # Set by make_network()
+
+    def __init__(self, interface_id=0):
+        self.interface_id = interface_id
+        self._active = False
+        self._config = {"essid": "", "channel": 1}
+
+    def active(self, is_active=None):
+        if is_active is None:
+            return self._active
+        self._active = bool(is_active)
+
+    def connect(self, ssid=None, key=None, **kwargs):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def isconnected(self):
+        return False
+
+    def config(self, *args, **kwargs):
+        if args:
+            if args[0] == "mac":
+                return self.board.mac
+            return self._config.get(args[0])
+        self._config.update(kwargs)
+
+    def ifconfig(self, config=None):
+        return ("192.168.4.1", "255.255.255.0", "192.168.4.1", "192.168.4.1")
+
+    def status(self, param=None):
+        if param == "stations":
+            return list(self.board.stations)
+        return 0
+
+
+class ESPNow:
+    MAX_DATA_LEN = ESPNOW_MAX_DATA_LEN
+    ADDR_LEN = 6
+    KEY_LEN = 16
+    MAX_TOTAL_PEER_NUM = 20
+    MAX_ENCRYPT_PEER_NUM = 6
+
+    board = None  # Set by make_espnow()
+
+    def __init__(self):
+        self._active = False
+        self._peers = {}
+        self._rx = []
+        self._irq = None
+        self.peers_table = {}
+        self.board.espnow = self
+
+    def active(self, flag=None):
+        if flag is None:
+            return self._active
+        self._active = bool(flag)
+
+    def config(self, **kwargs):
+        pass
+
+    def add_peer(self, mac, lmk=None, channel=0, ifidx=0, encrypt=False):
+        mac = bytes(mac)
+        if mac in self._peers:
+            raise OSError(-12395, "ESP_ERR_ESPNOW_EXIST")
+        if len(self._peers) >= self.MAX_TOTAL_PEER_NUM:
+            raise OSError(-12396, "ESP_ERR_ESPNOW_FULL")
+        self._peers[mac] = (mac, lmk, channel, ifidx, encrypt)
+
+    def del_peer(self, mac):
+        if self._peers.pop(bytes(mac), None) is None:
+            raise OSError(-12393, "ESP_ERR_ESPNOW_NOT_FOUND")
+
+    def get_peers(self):
+        return tuple(self._peers.values())
+
+    def get_peer(self, mac):
+        try:
+            return self._peers[bytes(mac)]
+        except KeyError:
+            raise OSError(-12393, "ESP_ERR_ESPNOW_NOT_FOUND")
+
+    def send(self, mac, msg=None, sync=True):
+        if msg is None:
+            mac, msg = None, mac
+        if not self._active:
+            raise OSError(-12389, "ESP_ERR_ESPNOW_NOT_INIT")
+        if len(msg) > self.MAX_DATA_LEN:
+            raise ValueError("msg too long")
+        if mac is not None and bytes(mac) != BROADCAST_MAC and bytes(mac) not in self._peers:
+            raise OSError(-12393, "ESP_ERR_ESPNOW_NOT_FOUND")
+        targets = list(self._peers) if mac is None else [bytes(mac)]
+        acked = True
+        for target in targets:
+            if not self.board.transmit(target, bytes(msg), sync):
+                acked = False
+        return acked if sync else True
+
+    def deliver(self, mac, msg):
+        """
+        Called by the Board when a frame arrives over the simulated air.
+        """
+        if not self._active:
+            return
+        self._rx.append((bytes(mac), bytearray(msg)))
+        self.peers_table[bytes(mac)] = [-40, self.board.clock.ticks_ms()]
+        if self._irq is not None:
+            self._irq(self)
+
+    def any(self):
+        return bool(self._rx)
+
+    def irecv(self, timeout_ms=None):
+        if not self._rx and timeout_ms != 0:
+            clock = self.board.clock
+            if timeout_ms is None:
+                timeout_ms = 300000
+            if timeout_ms < 0:
+                until = None
+            else:
+                until = clock.now_us + timeout_ms * 1000
+            while not self._rx:
+                due = clock.next_due()
+                if due is None:
+                    if until is not None:
+                        clock.run_until(until)
+                    break
+                if until is not None and due > until:
+                    clock.run_until(until)
+                    break
+                clock.run_until(due, stop=self.any)
+        if not self._rx:
+            return [None, None]
+        mac, msg = self._rx.pop(0)
+        return [mac, msg]
+
+    def recv(self, timeout_ms=None):
+        mac, msg = self.irecv(timeout_ms)
+        return [mac, bytes(msg) if msg is not None else None]
+
+    def irq(self, callback):
+        self._irq = callback
+
+    def stats(self):
+        return (len(self.board.sent), 0, 0, 0, 0)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.irecv()
+
+
+def make_network(board):
+    """
+    Builds a `network` module whose WLAN class is bound to a board.
+    """
+    module = types.ModuleType("network")
+    module.WLAN = type("WLAN", (WLAN,), {"board": board})
+    module.STA_IF = 0
+    module.AP_IF = 1
+    module.AUTH_OPEN = 0
+    module.AUTH_WPA_PSK = 2
+    module.AUTH_WPA2_PSK = 3
+    module.AUTH_WPA_WPA2_PSK = 4
+    return module
+
+
+def make_espnow(board):
+    """
+    Builds an `espnow` module whose ESPNow class is bound to a board.
+    """
+    module = types.ModuleType("espnow")
+    module.ESPNow = type("ESPNow", (ESPNow,), {"board": board})
+    module.MAX_DATA_LEN = ESPNOW_MAX_DATA_LEN
+    module.ADDR_LEN = ESPNow.ADDR_LEN
+    module.KEY_LEN = ESPNow.KEY_LEN
+    return module
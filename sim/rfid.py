@@ -0,0 +1,306 @@
+"""
+rfid.py
+
+Register-level fake of the MFRC522 for the simulator, and a rig that runs
+lib/mfrc522.py and lib/rfid_reader.py against it.
+
+The fake decodes SPI transactions the way the chip does: in a read every byte
+sent is an address and the reply to it comes back with the next byte, in a
+write every byte after the address goes to the same register. FIFODataReg
+reads and writes move through a 64 byte FIFO, so bursts are checked byte for
+byte. Transceive and CalcCRC are carried out against one simulated card, and
+a command the card does not answer ends with TimerIRq once the time set in
+TModeReg, TPrescalerReg and TReloadReg has passed on the virtual clock.
+
+Run the checks with:
+    python -m sim.rfid
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import sys
+
+from .board import Board
+
+SPI_ID = 1  # Bus the driver uses on the ESP32
+CS_PIN = 27
+RST_PIN = 25
+
+# Registers
+COMMAND_REG = 0x01
+COMM_IRQ_REG = 0x04
+DIV_IRQ_REG = 0x05
+ERROR_REG = 0x06
+FIFO_DATA_REG = 0x09
+FIFO_LEVEL_REG = 0x0A
+CONTROL_REG = 0x0C
+BIT_FRAMING_REG = 0x0D
+TX_CONTROL_REG = 0x14
+CRC_RESULT_REG_H = 0x21
+CRC_RESULT_REG_L = 0x22
+T_MODE_REG = 0x2A
+T_PRESCALER_REG = 0x2B
+T_RELOAD_REG_H = 0x2C
+T_RELOAD_REG_L = 0x2D
+
+# Commands
+IDLE = 0x00
+CALC_CRC = 0x03
+TRANSCEIVE = 0x0C
+SOFT_RESET = 0x0F
+
+FIFO_SIZE = 64
+CLOCK_HZ = 13560000
+POWER_UP_US = 2000  # Time a card needs in the field before it answers
+
+
+def crc_a(data):
+    """
+    Returns the ISO 14443-A CRC of data as (low byte, high byte).
+    """
+    crc = 0x6363
+    for byte in data:
+        byte ^= crc & 0xFF
+        byte = (byte ^ (byte << 4)) & 0xFF
+        crc = (crc >> 8) ^ (byte << 8) ^ (byte << 3) ^ (byte >> 4)
+    return crc & 0xFF, (crc >> 8) & 0xFF
+
+
+class MFRC522Chip:
+    """
+    Simulated MFRC522 with at most one card in its field.
+
+    Attributes:
+        regs (bytearray): Register file.
+        fifo (list): FIFO contents, oldest byte first.
+        uid (bytes): 4 byte UID of the card in the field, None if there is none.
+        accesses (list): ("r" or "w", register, value) for every register access.
+        frames (list): (time_us, frame) for every frame sent to the card.
+    """
+
+    def __init__(self, board, uid=None):
+        self.board = board
+        self.uid = uid
+        self.regs = bytearray(0x40)
+        self.fifo = []
+        self.accesses = []
+        self.frames = []
+        self._timer_due = None
+        self._field_since = None
+        self._card_state = "idle"
+        self.reset()
+
+    def reset(self):
+        self.regs[:] = bytes(0x40)
+        self.regs[COMMAND_REG] = 0x20
+        self.regs[TX_CONTROL_REG] = 0x80
+        self.fifo = []
+        self._timer_due = None
+        self._set_field(False)
+
+    # SPI
+
+    def __call__(self, tx):
+        """
+        Handles one SPI transaction and returns the bytes clocked out by the chip.
+        """
+        rx = bytearray(len(tx))
+        if not tx:
+            return bytes(rx)
+        if tx[0] & 0x80:
+            for i in range(len(tx) - 1):
+                rx[i + 1] = self._read((tx[i] >> 1) & 0x3F)
+        else:
+            reg = (tx[0] >> 1) & 0x3F
+            for value in tx[1:]:
+                self._write(reg, value)
+        return bytes(rx)
+
+    def _read(self, reg):
+        if reg == COMM_IRQ_REG and self._timer_due is not None and self.board.clock.now_us >= self._timer_due:
+            self._timer_due = None
+            self.regs[COMM_IRQ_REG] |= 0x01  # TimerIRq
+        if reg == FIFO_DATA_REG:
+            value = self.fifo.pop(0) if self.fifo else 0
+        elif reg == FIFO_LEVEL_REG:
+            value = len(self.fifo)
+        else:
+            value = self.regs[reg]
+        self.accesses.append(("r", reg, value))
+        return value
+
+    def _write(self, reg, value):
+        self.accesses.append(("w", reg, value))
+        if reg == FIFO_DATA_REG:
+            if len(self.fifo) < FIFO_SIZE:
+                self.fifo.append(value)
+        elif reg == FIFO_LEVEL_REG:
+            if value & 0x80:
+                self.fifo = []  # FlushBuffer
+        elif reg in (COMM_IRQ_REG, DIV_IRQ_REG):
+            if value & 0x80:
+                self.regs[reg] |= value & 0x7F  # Set1
+            else:
+                self.regs[reg] &= ~value & 0xFF
+        elif reg == COMMAND_REG:
+            self.regs[reg] = (self.regs[reg] & 0x30) | (value & 0x0F)
+            self._command(value & 0x0F)
+        elif reg == BIT_FRAMING_REG:
+            self.regs[reg] = value & 0x7F
+            if value & 0x80 and self.regs[COMMAND_REG] & 0x0F == TRANSCEIVE:
+                self._transceive()
+        elif reg == TX_CONTROL_REG:
+            self.regs[reg] = value
+            self._set_field(bool(value & 0x03))
+        else:
+            self.regs[reg] = value
+
+    # Commands
+
+    def _command(self, command):
+        if command == SOFT_RESET:
+            self.reset()
+        elif command == IDLE:
+            self._timer_due = None
+        elif command == CALC_CRC:
+            low, high = crc_a(self.fifo)
+            self.regs[CRC_RESULT_REG_L] = low
+            self.regs[CRC_RESULT_REG_H] = high
+            self.regs[DIV_IRQ_REG] |= 0x04  # CRCIRq
+            self.regs[COMMAND_REG] &= 0xF0
+
+    def timer_us(self):
+        """
+        Returns the time the chip timer runs for, as set by the driver.
+        """
+        prescaler = ((self.regs[T_MODE_REG] & 0x0F) << 8) | self.regs[T_PRESCALER_REG]
+        reload = (self.regs[T_RELOAD_REG_H] << 8) | self.regs[T_RELOAD_REG_L]
+        return (reload + 1) * (2 * prescaler + 1) * 1000000 // CLOCK_HZ
+
+    def _set_field(self, on):
+        if not on:
+            self._field_since = None
+            self._card_state = "idle"  # The card loses power and starts over
+        elif self._field_since is None:
+            self._field_since = self.board.clock.now_us
+
+    def _transceive(self):
+        frame = bytes(self.fifo)
+        self.fifo = []
+        self.frames.append((self.board.clock.now_us, frame))
+        answer = self._card_answer(frame)
+        self.regs[ERROR_REG] = 0
+        if answer is None:
+            # TAuto: the timer starts at the end of the transmission and nothing stops it
+            self._timer_due = self.board.clock.now_us + self.timer_us()
+            return
+        self.fifo = list(answer)
+        self.regs[CONTROL_REG] &= 0xF8  # Whole bytes received
+        self.regs[COMM_IRQ_REG] |= 0x30  # RxIRq, IdleIRq
+
+    def _card_answer(self, frame):
+        clock = self.board.clock
+        if self.uid is None or self._field_since is None or clock.now_us - self._field_since < POWER_UP_US:
+            return None
+        uid = self.uid
+        if frame == b"\x26" and self._card_state == "idle" or frame == b"\x52":
+            self._card_state = "ready"
+            return b"\x04\x00"  # ATQA
+        bcc = uid[0] ^ uid[1] ^ uid[2] ^ uid[3]
+        if frame == b"\x93\x20" and self._card_state == "ready":
+            return uid + bytes((bcc,))
+        if frame[:2] == b"\x93\x70" and len(frame) == 9 and self._card_state == "ready":
+            if frame[2:7] != uid + bytes((bcc,)) or bytes(crc_a(frame[:7])) != frame[7:]:
+                return None
+            self._card_state = "active"
+            sak = b"\x08"
+            return sak + bytes(crc_a(sak))
+        return None
+
+
+class RFIDRig:
+    """
+    RFIDReader and its MFRC522 driver on a board with a simulated chip.
+
+    Attributes:
+        board (Board): Simulated reader board.
+        chip (MFRC522Chip): The chip on the board's SPI bus.
+        reader (RFIDReader): Reader built the way the reader scripts build it.
+    """
+
+    def __init__(self, uid=None):
+        self.board = Board()
+        self.chip = MFRC522Chip(self.board, uid)
+        self.board.spi_devices[SPI_ID] = self.chip
+        self.module = self.board.load("rfid_reader")
+        self.reader = self.module.RFIDReader(cs_pin=CS_PIN, rst_pin=RST_PIN)
+
+    @property
+    def rdr(self):
+        return self.reader.rdr
+
+    def transfers(self):
+        """
+        Returns the number of SPI transactions so far.
+        """
+        return len(self.board.spi_log)
+
+
+def main():
+    failures = []
+
+    def check(name, ok, detail=""):
+        print("%s %s%s" % ("ok  " if ok else "FAIL", name, " (%s)" % detail if detail else ""))
+        if not ok:
+            failures.append(name)
+
+    # FIFO bursts
+    rig = RFIDRig()
+    data = bytes(range(0x11, 0x11 + 40))
+    before = rig.transfers()
+    rig.rdr._wfifo(data)
+    check("FIFO written in one transaction", rig.transfers() - before == 1, "%d" % (rig.transfers() - before))
+    check("FIFO holds the written bytes", bytes(rig.chip.fifo) == data)
+    before = rig.transfers()
+    read = bytes(rig.rdr._rfifo(len(data)))
+    check("FIFO read in one transaction", rig.transfers() - before == 1, "%d" % (rig.transfers() - before))
+    check("FIFO read returns the written bytes", read == data, read.hex())
+    check("FIFO empty after the read", not rig.chip.fifo)
+
+    # Timer set up by set_timeout()
+    module = rig.module
+    check(
+        "chip timer matches CARD_TIMEOUT",
+        rig.chip.timer_us() == module.CARD_TIMEOUT * 1000,
+        "%d us" % rig.chip.timer_us(),
+    )
+    start = rig.board.clock.now_us
+    uid = rig.reader.probe()
+    took = (rig.board.clock.now_us - start) / 1000
+    limit = module.FIELD_SETTLE_TIME + module.CARD_TIMEOUT + 1
+    check("probe without a card", uid is None and took <= limit, "%.2f ms" % took)
+    check("antenna off after a probe", not rig.chip.regs[TX_CONTROL_REG] & 0x03)
+
+    # A card in the field
+    card = b"\x72\x93\x31\x03"
+    rig.chip.uid = card
+    uid = rig.reader.probe()
+    expected = "0x" + (card + bytes((card[0] ^ card[1] ^ card[2] ^ card[3],))).hex().upper()
+    check("probe finds the card", uid == expected, str(uid))
+    rig.rdr.antenna_on()
+    rig.board.clock.sleep_ms(module.FIELD_SETTLE_TIME)
+    stat, _ = rig.rdr.request(rig.rdr.REQIDL)
+    stat, raw_uid = rig.rdr.anticoll()
+    check("anticollision returns the UID", stat == rig.rdr.OK and bytes(raw_uid[:4]) == rig.chip.uid)
+    before = rig.transfers()
+    check("select with the driver's CRC", rig.rdr.select_tag(raw_uid) == rig.rdr.OK)
+    print("select took %d SPI transactions" % (rig.transfers() - before))
+
+    if failures:
+        print("%d check(s) failed" % len(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+admin_board.py
+
+Board that decides which cards may pass the gate. Card scans reach it from the
+readers through runner_board, and it answers each one from the card index on
+its flash (see lib/card_index.py).
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import espnow  # type: ignore
+import network  # type: ignore
+from card_index import CardIndex
+from bloom_filter import BloomFilter
+from gate_protocol import (
+    Encoder,
+    Message,
+    parse,
+    OP_CACHE_INVALIDATE,
+    OP_BLOOM_REQUEST,
+    OP_BLOOM_CHUNK,
+    OP_BLOOM_UPDATE,
+    OP_INSIDE_REQUEST,
+    OP_INSIDE_GRANTED,
+    OP_INSIDE_DENIED,
+    OP_OUTSIDE_REQUEST,
+    OP_OUTSIDE_GRANTED,
+    OP_OUTSIDE_DENIED,
+    ROLE_ADMIN,
+)
+
+CARD_INDEX_FILE = "cards.bin"  # Build it with utility/build_card_index.py
+BROADCAST_MAC = b'\xff' * 6  # Reaches the runner, which passes the frame on to every reader
+BLOOM_SIZE = 4096  # Bytes of the allowlist filter sent to the readers, must match the readers
+
+# Request opcode -> (granted, denied) reply opcodes
+REPLIES = {
+    OP_INSIDE_REQUEST: (OP_INSIDE_GRANTED, OP_INSIDE_DENIED),
+    OP_OUTSIDE_REQUEST: (OP_OUTSIDE_GRANTED, OP_OUTSIDE_DENIED),
+}
+
+# A WLAN interface must be active to send()/recv() via ESP-NOW
+sta = network.WLAN(network.STA_IF)
+sta.active(True)
+sta.disconnect()  # Ensure no active connections
+
+# Initialize and activate ESP-NOW
+e = espnow.ESPNow()
+e.active(True)
+
+cards = CardIndex(CARD_INDEX_FILE)
+encoder = Encoder(ROLE_ADMIN)
+message = Message()  # Reused for every received frame
+print(f"[ADMIN] {len(cards)} cards in {CARD_INDEX_FILE}")
+e.add_peer(BROADCAST_MAC)
+
+def build_filter():
+    """
+    Builds the allowlist filter the readers use when they can not reach this board.
+    """
+    bloom = BloomFilter(BLOOM_SIZE)
+    for uid in cards.uids():
+        bloom.add(uid)
+    return bloom
+
+allowlist = build_filter()
+
+def send_filter_chunks(mac, indexes, seq=-1):
+    """
+    Sends chunks of the allowlist filter.
+
+    Args:
+        mac (bytes): MAC address of the board the request came from, or BROADCAST_MAC.
+        indexes (iterable): Chunk indexes to send.
+        seq (int): Sequence number of the request being answered, or -1 for a broadcast.
+    """
+    if seq < 0:
+        opcode = OP_BLOOM_UPDATE  # Not a reply, the runner passes it on to every reader
+    else:
+        opcode = OP_BLOOM_CHUNK
+        try:
+            e.add_peer(mac)
+        except OSError:
+            pass  # Already a peer
+    count = allowlist.chunk_count
+    for index in indexes:
+        frame = encoder.encode(opcode, index, count, allowlist.chunk(index), seq=seq)
+        try:
+            e.send(mac, frame)  # Wait for each frame, a burst would overflow the radio buffers
+        except OSError as ex:
+            print(f"[ADMIN] Failed to send filter chunk {index} to {mac}: {ex}")
+            return
+
+def invalidate_readers(uids=b""):
+    """
+    Tells the readers to forget cached decisions.
+
+    Args:
+        uids (bytes): Concatenated 4 byte UIDs whose decision changed, or empty for all of them.
+    """
+    try:
+        e.send(BROADCAST_MAC, encoder.encode(OP_CACHE_INVALIDATE, uids), False)
+    except OSError as ex:
+        print(f"[ADMIN] Failed to broadcast cache invalidation: {ex}")
+
+def reload_cards():
+    """
+    Reopens the card index after it was replaced, e.g. from the REPL, invalidates the reader caches
+    and sends the readers the parts of the allowlist filter that changed.
+    """
+    global allowlist
+    cards.reload()
+    print(f"[ADMIN] {len(cards)} cards in {CARD_INDEX_FILE}")
+    invalidate_readers()
+    rebuilt = build_filter()
+    changed = rebuilt.changed_chunks(allowlist)
+    allowlist = rebuilt
+    send_filter_chunks(BROADCAST_MAC, changed)  # Only the chunks that changed
+
+def reply(mac, opcode, seq, legacy):
+    """
+    Sends a reply to the board the request came from, usually the runner.
+
+    Args:
+        mac (bytes): MAC address of the sender.
+        opcode (int): Reply opcode.
+        seq (int): Sequence number of the request.
+        legacy (bool): True if the request was in the old format, the reply is then the bare opcode.
+    """
+    try:
+        e.add_peer(mac)
+    except OSError:
+        pass  # Already a peer
+    frame = bytes((opcode,)) if legacy else encoder.encode(opcode, seq=seq)
+    try:
+        e.send(mac, frame, False)
+    except OSError as ex:
+        print(f"[ADMIN] Failed to reply to {mac}: {ex}")
+
+def handle(mac, msg):
+    if parse(msg, message) is None:
+        return
+    if message.opcode == OP_BLOOM_REQUEST:
+        send_filter_chunks(mac, range(allowlist.chunk_count), message.seq)
+        return
+    replies = REPLIES.get(message.opcode)
+    if replies is None:
+        return
+    granted = cards.contains(message.payload)
+    reply(mac, replies[0] if granted else replies[1], message.seq, not message.version)
+
+def main():
+    invalidate_readers()  # The index may have changed while this board was off
+    send_filter_chunks(BROADCAST_MAC, range(allowlist.chunk_count))
+    while True:
+        mac, msg = e.irecv(-1)  # Nothing else to do, wait for the next request
+        if mac is not None:
+            handle(mac, msg)
+
+main()
@@ -1,18 +1,60 @@
 """
 This gate system app version is semi-timer based meaning, it is designed such that the gate will open and stop
 based on the the sensor reading. For closing the gate, the stop will be based on the timer countdown.
+
+The behaviour of each leaf is defined by the transition table in lib/gate_fsm.py. The handlers below only turn
+pins and timers into events for that table.
 """
 
 import network  # type: ignore
 import espnow  # type: ignore
 
-from lib.gate_control import Gate
-from lib.bounce import PinDebounce
+from lib.gate_control import Gate, RelaySequencer
+from lib.timer_wheel import TimerWheel
+from lib.leaf_travel import TravelLearner, CLOSE_MARGIN
+from lib.gate_protocol import (
+    Message,
+    Encoder,
+    parse,
+    OP_OPEN,
+    OP_LOG_REQUEST,
+    OP_LOG_RECORDS,
+    ROLE_GATE_CONTROLLER,
+)
+from lib.event_log import (
+    EventLog,
+    LOG_BUTTON,
+    LOG_SYSTEM_ON,
+    LOG_OPEN_REACHED,
+    LOG_BREAK,
+    LOG_CLOSE_BLOCKED,
+    LOG_CLOSE_DONE,
+    LOG_TRANSITION,
+    LOG_ALL_CLOSED,
+    LOG_SYSTEM_OFF,
+    LOG_ESPNOW_RX,
+    LOG_COUNTDOWN,
+    RECORD_SIZE,
+)
+from lib.bounce import DebounceGroup
+from lib.gate_fsm import (
+    Leaf,
+    GateMachine,
+    CLOSED,
+    OPENING,
+    CLOSING,
+    EV_OPEN_REQUEST,
+    EV_BREAK,
+    EV_OPEN_REACHED,
+    EV_CLOSE_REQUEST,
+    EV_CLOSE_DONE,
+)
 
 from machine import Pin, Timer  # type: ignore
 
-VERBOSE = True
-verbose_print = print if VERBOSE else lambda *a, **k: None
+# Events are written to a binary ring instead of being printed, see lib/event_log.py.
+# Dump it from the REPL with event_log.dump(), or over ESP-NOW by sending OP_LOG_REQUEST.
+event_log = EventLog(capacity=256)
 
 ##################
 # PIN ASSIGNMENT #
@@ -35,15 +77,29 @@ OPEN_GATE_SWITCH_PIN = 35  # Pin that opens the gate
 ################
 
 KEEP_GATE_OPEN_TIME = 15000  # Default time to keep the gate open in ms
+# Hand-measured full close times (see utility/get_gate_close_time.py). The close is stretched
+# if the timed opening strokes show a leaf getting slower, but never made shorter (see lib/leaf_travel.py).
 GATE_1_TIME_TO_CLOSE = 11000  # Default time to close gate 1 in ms
 GATE_2_TIME_TO_CLOSE = 12300  # Default time to close gate 2 in ms
 LAMP_PERIOD = 500  # Default time to blink the lamp in ms
+TICK_PERIOD = 10  # Resolution of the timer wheel in ms
+SENSOR_SAMPLES = 2  # Consistent samples, one per tick, needed before an input changes
+GATE_1_STAGGER = 0  # Delay before gate 1 starts closing in ms, for overlapping leaves
+GATE_2_STAGGER = 0  # Delay before gate 2 starts opening in ms, for overlapping leaves
+
+##################
+# ESP-NOW Frames #
+##################
+
+# Frames are encoded with lib/gate_protocol.py
+LOG_RECORDS_PER_FRAME = 30  # 30 records of 8 bytes fit in one ESP-NOW frame
 
 #############
 # Variables #
 #############
 
 system_active = False
+lamp_blinking = False
 
 ##########################
 # PIN Callback Functions #
@@ -53,202 +109,34 @@ system_active = False
 def open_gate_switch_handler():
     global system_active
 
-    verbose_print("Button pressed.")
+    event_log.record(LOG_BUTTON)
     # If system is inactive, activate it
     if not system_active:
         system_active = True
-        verbose_print("System activated.")
-
-    gate_1_close_timer.deinit()
-    verbose_print("Gate 1 close timer deactivated.")
-    gate_2_close_timer.deinit()
-    verbose_print("Gate 2 close timer deactivated.")
-
-    if gate_1.status == 0:  # # If gate 1 is closed and PB is pressed.
-        gate_1.move_ccw()  # Open gate 1
-        verbose_print("Gate 1 will now be opened...")
-        gate_1_open_sensor.enable_irq()
-        verbose_print(
-            "Gate 1 opened sensor interrupt service activated - push button pressed"
-        )
-        verbose_print("Lamp blinking started by gate 1 - PB.")
-        gate_1.status = 1  # Set gate 1 status to opening.
-        break_sensor.disable_irq()  # Disable break sensor interrupt service
-    elif gate_1.status == 1:  # If gate 1 is opening and PB is pressed.
-        verbose_print("Gate 1 is already opening...")
-        verbose_print("PB did not affect the gate 1 motor.")
-    elif gate_1.status == 2:  # If gate 1 is opened and PB is pressed.
-        verbose_print("Gate 1 is already opened...")
-        verbose_print("PB restarting the countdown timer.")
-        gate_countdown_timer.deinit()
-        gate_countdown_timer.init(
-            mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
-        )
-        verbose_print("PB has restarted the countdown timer.")
-    elif gate_1.status == 3:  # If gate 1 is closing and PB is pressed.
-        gate_1_close_timer.deinit()  # Deactivate the timer
-        gate_1.stop_gate()  # Stop gate 1 motor
-        if gate_1_open_sensor.pin.value() == 0:
-            gate_1.move_ccw()  # Open gate 1
-            verbose_print("Gate 1 will now be opened...")
-            gate_1_open_sensor.enable_irq()
-            gate_1.status = 1  # Set gate 1 status to opening.
-        else:
-            gate_1.status = 2  # Set gate 1 status to opened
-    else:
-        verbose_print("Gate 1 is in an unknown state...")
-
-    if gate_2.status == 0:  # If gate 2 is closed and PB is pressed.
-        gate_2.move_ccw()  # Open gate 2
-        verbose_print("Gate 2 will now be opened...")
-        gate_2_open_sensor.enable_irq()
-        verbose_print(
-            "Gate 2 opened sensor interrupt service activated - push button pressed"
-        )
-        verbose_print("Lamp blinking started by gate 2 - PB.")
-        gate_2.status = 1  # Set gate 2 status to opening.
-    elif gate_2.status == 1:  # If gate 2 is opening and PB is pressed.
-        verbose_print("Gate 2 is already opening...")
-        verbose_print("PB did not affect the gate 2 motor.")
-    elif gate_2.status == 2:  # If gate 2 is opened and PB is pressed.
-        verbose_print("Gate 2 is already opened...")
-        verbose_print("PB restarting the countdown timer.")
-        gate_countdown_timer.deinit()
-        gate_countdown_timer.init(
-            mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
-        )
-        verbose_print("PB has restarted the countdown timer.")
-    elif gate_2.status == 3:  # If gate 2 is closing and PB is pressed.
-        gate_2_close_timer.deinit()  # Deactivate the timer
-        gate_2.stop_gate()  # Stop gate 2 motor
-        if gate_2_open_sensor.pin.value() == 0:
-            gate_2.move_ccw()  # Open gate 2
-            verbose_print("Gate 2 will now be opened...")
-            gate_2_open_sensor.enable_irq()
-            gate_2.status = 1  # Set gate 2 status to opening.
-        else:
-            gate_2.status = 2  # Set gate 2 status to opened
-    else:
-        verbose_print("Gate 2 is in an unknown state...")
+        event_log.record(LOG_SYSTEM_ON)
 
-    # Lamp control by PB
-    if gate_1.status == 1 or gate_2.status == 1:  # If any gate is opening
-        lamp_timer.deinit()  # Deactivate the timer
-        lamp.value(0)  # Turn off the lamp
-        lamp_timer.init(mode=Timer.PERIODIC, period=LAMP_PERIOD, callback=lamp_blink)
+    gates.broadcast(EV_OPEN_REQUEST)
+    update_system()
 
 
 def gate_1_open_sensor_handler():
-    verbose_print("Gate 1 opened.")
-    gate_1.stop_gate()  # Stop gate 1 motor
-    gate_1.status = 2  # Set gate 1 status to opened
-    if gate_2.status == 2 and gate_1.status == 2:  # If both gates are opened
-        # Stop the lamp blinking
-        lamp_timer.deinit()
-        if lamp.value() == 0:
-            lamp.on()
-    gate_1_open_sensor.disable_irq()  # Disable gate 1 open sensor interrupt service
-    verbose_print(
-        "Gate 1 opened sensor interrupt service deactivated - reached open sensor."
-    )
-    verbose_print("Break sensor interrupt service deactivated.")
-    gate_1_close_timer.deinit()
-    gate_countdown_timer.deinit()
-    gate_countdown_timer.init(
-        mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
-    )
-    verbose_print("Gate 1 is fully opened. Restarting countdown timer...")
+    event_log.record(LOG_OPEN_REACHED, 1, gate_1.status)
+    learn_open_stroke(leaf_1)
+    gates.dispatch(leaf_1, EV_OPEN_REACHED)
+    update_system()
 
 
 def gate_2_open_sensor_handler():
-    verbose_print("Gate 2 opened.")
-    gate_2.stop_gate()  # Stop gate 2 motor
-    gate_2.status = 2  # Set gate 2 status to opened
-    if gate_1.status == 2 and gate_2.status == 2:  # If both gates are opened
-        # Stop the lamp blinking
-        lamp_timer.deinit()
-        if lamp.value() == 0:
-            lamp.on()
-    gate_2_open_sensor.disable_irq()  # Disable gate 2 open sensor interrupt service
-    verbose_print(
-        "Gate 2 opened sensor interrupt service deactivated - reached open sensor."
-    )
-    verbose_print("Break sensor interrupt service deactivated.")
-    gate_2_close_timer.deinit()
-    gate_countdown_timer.deinit()
-    gate_countdown_timer.init(
-        mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
-    )
-    verbose_print("Gate 2 is fully opened. Restarting countdown timer...")
-    break_sensor.disable_irq()  # Disable break sensor interrupt service
+    event_log.record(LOG_OPEN_REACHED, 2, gate_2.status)
+    learn_open_stroke(leaf_2)
+    gates.dispatch(leaf_2, EV_OPEN_REACHED)
+    update_system()
 
 
 def break_sensor_handler():
-    verbose_print("Break sensor triggered.")
-
-    if gate_1.status == 1:  # If gate 1 is opening
-        # ignore the break sensor callback
-        verbose_print("Gate 1 is opening, break sensor ignored.")
-    elif gate_1.status == 2:  # If gate 1 is opened
-        # reset the countdown timer
-        verbose_print(
-            "Gate 1 is opened, break sensor has restarted the countdown timer."
-        )
-        gate_countdown_timer.deinit()
-        gate_countdown_timer.init(
-            mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
-        )
-    elif gate_1.status == 3:  # If gate 1 is closing
-        gate_1_close_timer.deinit()  # Deactivate the timer
-        gate_1.stop_gate()  # Stop gate 1 motor
-        if gate_1_open_sensor.pin.value() == 0:
-            gate_1.move_ccw()  # Open gate 1
-            verbose_print("Gate 1 will now be opened...")
-            gate_1_open_sensor.enable_irq()  # Re-enable gate 1 open sensor interrupt service
-            gate_1.status = 1  # Set gate 1 status to opening.
-        else:
-            gate_1.status = 2  # Set gate 1 status to opened
-    elif gate_1.status == 0:  # If gate 1 is closed
-        # ignore the break sensor callback
-        verbose_print("Gate 1 is closed, break sensor ignored.")
-    else:
-        verbose_print("Gate 1 is in an unknown state...")
-
-    if gate_2.status == 1:  # If gate 2 is opening
-        # ignore the break sensor callback
-        verbose_print("Gate 2 is opening, break sensor ignored.")
-    elif gate_2.status == 2:  # If gate 2 is opened
-        # reset the countdown timer
-        verbose_print(
-            "Gate 2 is opened, break sensor has restarted the countdown timer."
-        )
-        gate_countdown_timer.deinit()
-        gate_countdown_timer.init(
-            mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
-        )
-    elif gate_2.status == 3:  # If gate 2 is closing
-        gate_2_close_timer.deinit()  # Deactivate the timer
-        gate_2.stop_gate()  # Stop gate 2 motor
-        if gate_2_open_sensor.pin.value() == 0:
-            gate_2.move_ccw()
-            # Open gate 2
-            verbose_print("Gate 2 will now be opened...")
-            gate_2_open_sensor.enable_irq()  # Re-enable gate 2 open sensor interrupt service
-            gate_2.status = 1  # Set gate 2 status to opening.
-        else:
-            gate_2.status = 2  # Set gate 2 status to opened
-    elif gate_2.status == 0:  # If gate 2 is closed
-        # ignore the break sensor callback
-        verbose_print("Gate 2 is closed, break sensor ignored.")
-    else:
-        verbose_print("Gate 2 is in an unknown state...")
-
-    if gate_1.status == 2 and gate_2.status == 2:
-        # If both gates are opened
-        # Stop the lamp blinking
-        lamp_timer.deinit()
-        if lamp.value() == 0:
-            lamp.on()
+    event_log.record(LOG_BREAK)
+    gates.broadcast(EV_BREAK)
+    update_system()
 
 
 ############################
@@ -262,79 +150,158 @@ def close_gates(timer):
     """
 
     if break_sensor.pin.value() == 1:
-        verbose_print("Attempted to close gates but break sensor is active.")
-        verbose_print("Restarting countdown timer...")
-        gate_countdown_timer.deinit()
-        gate_countdown_timer.init(
-            mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
-        )
-        gate_1.status = 2  # Set gate 1 status to opened
-        gate_2.status = 2  # Set gate 2 status to opened
+        # Attempted to close gates but break sensor is active
+        event_log.record(LOG_CLOSE_BLOCKED)
+        restart_countdown(None)
         return
 
-    if gate_1.status == 2:  # If gate 1 is opened
-        verbose_print("Gate 1 will now be closed...")
-        gate_1.move_cw()
-        gate_1_close_timer.init(
-            mode=Timer.ONE_SHOT, period=GATE_1_TIME_TO_CLOSE, callback=close_gate_1
-        )
-        gate_1.status = 3  # Set gate 1 status to closing
-
-    if gate_2.status == 2:  # If gate 2 is opened
-        verbose_print("Gate 2 will now be closed...")
-        gate_2.move_cw()
-        gate_2_close_timer.init(
-            mode=Timer.ONE_SHOT, period=GATE_2_TIME_TO_CLOSE, callback=close_gate_2
-        )
-        gate_2.status = 3  # Set gate 2 status to closing
-
-    # If either gate is closing, Blink the lamp
-    if gate_1.status == 3 or gate_2.status == 3:
-        verbose_print("Lamp blinking started by timer.")
-        lamp_timer
-        lamp_timer.init(mode=Timer.PERIODIC, period=LAMP_PERIOD, callback=lamp_blink)
-        verbose_print("Lamp blinking started by close gates timer.")
-        break_sensor.enable_irq()  # Enable break sensor interrupt service
-        verbose_print("Break sensor interrupt service activated by close gates timer.")
-
-
-def close_gate_1(timer):
-    gate_1.status = 0  # Set gate 1 status to closed
-    gate_1.stop_gate()
-    verbose_print("Gate 1 closed.")
-
-    if gate_1.status == 0 and gate_2.status == 0:
-        # If both gates are closed
-        # Decativate the system
-        verbose_print("Both gates are closed.")
-        deactivate_system()
-
-
-def close_gate_2(timer):
-    gate_2.status = 0  # Set gate 2 status to closed
-    gate_2.stop_gate()
-    verbose_print("Gate 2 closed.")
-
-    if gate_1.status == 0 and gate_2.status == 0:
-        # If both gates are closed
-        # Decativate the system
-        verbose_print("Both gates are closed.")
-        deactivate_system()
+    gates.broadcast(EV_CLOSE_REQUEST)
+    update_system()
+
+
+def close_timer_expired(timer):
+    """
+    This function is called when the close timer of a leaf expires.
+    """
+    for leaf in gates.leaves:
+        if leaf.close_timer is timer:
+            event_log.record(LOG_CLOSE_DONE, leaf.number, leaf.gate.status)
+            gates.dispatch(leaf, EV_CLOSE_DONE)
+            travel.close_finished(leaf.number - 1, leaf.time_to_close)
+    update_system()
+
+
+def service_relays(timer):
+    relays.service()
 
 
 def lamp_blink(timer):
     lamp.on() if lamp.value() == 0 else lamp.off()
 
 
+################
+# Leaf Actions #
+################
+
+
+def open_leaf(leaf):
+    # Only timed if the last full close ran to the end stop
+    travel.stroke_started(leaf.number - 1, leaf.gate.lead_time(True))
+    travel.motor_started(leaf.number - 1, True, leaf.gate.lead_time(True))
+    leaf.gate.move_ccw()
+
+
+def close_leaf(leaf):
+    travel.motor_started(leaf.number - 1, False, leaf.gate.lead_time(False))
+    leaf.gate.move_cw()
+
+
+def stop_leaf(leaf):
+    travel.motor_stopped(leaf.number - 1)
+    leaf.gate.stop_gate()
+
+
+def arm_open_sensor(leaf):
+    leaf.open_sensor.enable_irq()
+
+
+def disarm_open_sensor(leaf):
+    leaf.open_sensor.disable_irq()
+
+
+def start_close_timer(leaf):
+    # Only the travel left from the estimated position, e.g. after the leaf was held open part way.
+    # The stroke starts once the relays have switched the motor on.
+    leaf.time_to_close = travel.close_time(leaf.number - 1)
+    period = leaf.time_to_close + leaf.gate.lead_time(False)
+    leaf.close_timer.init(
+        mode=Timer.ONE_SHOT, period=period, callback=close_timer_expired
+    )
+
+
+def cancel_close_timer(leaf):
+    leaf.close_timer.deinit()
+
+
+def restart_countdown(leaf):
+    event_log.record(LOG_COUNTDOWN)
+    gate_countdown_timer.deinit()
+    gate_countdown_timer.init(
+        mode=Timer.ONE_SHOT, period=KEEP_GATE_OPEN_TIME, callback=close_gates
+    )
+
+
+def arm_break_sensor(leaf):
+    break_sensor.enable_irq()
+
+
+def disarm_break_sensor(leaf):
+    break_sensor.disable_irq()
+
+
 ####################
 # Global Functions #
 ####################
 
 
+def learn_open_stroke(leaf):
+    """
+    Updates the travel estimate and the position of a leaf that reached its open sensor.
+    """
+    travel.stroke_finished(leaf.number - 1)
+
+
+def trace_transition(leaf, event):
+    event_log.record(LOG_TRANSITION, leaf.number, leaf.gate.status, event)
+
+
+def send_event_log(mac, seq):
+    """
+    Sends the event log to a peer as OP_LOG_RECORDS frames, oldest records first.
+
+    Args:
+        mac (bytes): MAC address of the peer.
+        seq (int): Sequence number of the request, repeated in every reply frame.
+    """
+    try:
+        e.add_peer(mac)
+    except OSError:
+        pass  # Already a peer
+    data = memoryview(event_log.snapshot())
+    chunk = LOG_RECORDS_PER_FRAME * RECORD_SIZE
+    for index, start in enumerate(range(0, len(data), chunk)):
+        e.send(mac, encoder.encode(OP_LOG_RECORDS, index, data[start : start + chunk], seq=seq))
+
+
+def update_system():
+    """
+    Updates the lamp from the leaf states and deactivates the system once both leaves are closed.
+    """
+    global lamp_blinking
+
+    if gates.any_in(OPENING) or gates.any_in(CLOSING):
+        # Blink the lamp while any leaf is moving
+        if not lamp_blinking:
+            lamp_blinking = True
+            lamp.value(0)
+            lamp_timer.init(
+                mode=Timer.PERIODIC, period=LAMP_PERIOD, callback=lamp_blink
+            )
+    elif gates.all_in(CLOSED):
+        if system_active:
+            event_log.record(LOG_ALL_CLOSED)
+            deactivate_system()
+    else:
+        # Leaves are standing open, keep the lamp on
+        lamp_timer.deinit()
+        lamp_blinking = False
+        lamp.on()
+
+
 def deactivate_system():
-    global system_active
+    global system_active, lamp_blinking
     system_active = False
-    verbose_print("Deactivating system...")
+    event_log.record(LOG_SYSTEM_OFF)
 
     # Disable IRQs
     gate_1_open_sensor.disable_irq()
@@ -346,28 +313,59 @@ def deactivate_system():
     gate_2_close_timer.deinit()
 
     lamp_timer.deinit()
+    lamp_blinking = False
     lamp.value(0)  # Turn off the lamp
 
+    travel.save()  # The gate is idle, store what was learned
+
 
-gate_1 = Gate(K1_MOTOR_1, K2_MOTOR_1)
-gate_2 = Gate(K4_MOTOR_2, K3_MOTOR_2)
+relays = RelaySequencer()
+gate_1 = Gate(K1_MOTOR_1, K2_MOTOR_1, relays, close_delay=GATE_1_STAGGER)
+gate_2 = Gate(K4_MOTOR_2, K3_MOTOR_2, relays, open_delay=GATE_2_STAGGER)
 lamp = Pin(LAMP_PIN, Pin.OUT)
 
-gate_1_open_sensor = PinDebounce(
+# All inputs are sampled together from one periodic tick
+sensors = DebounceGroup(threshold=SENSOR_SAMPLES)
+gate_1_open_sensor = sensors.add(
     GATE_1_OPEN_SENSOR_PIN, gate_1_open_sensor_handler, debounce_time=3000
 )
-gate_2_open_sensor = PinDebounce(
+gate_2_open_sensor = sensors.add(
     GATE_2_OPEN_SENSOR_PIN, gate_2_open_sensor_handler, debounce_time=3000
 )
-break_sensor = PinDebounce(BREAK_SENSOR_PIN, break_sensor_handler, debounce_time=800)
-open_gate_switch = PinDebounce(
+break_sensor = sensors.add(BREAK_SENSOR_PIN, break_sensor_handler, debounce_time=800)
+open_gate_switch = sensors.add(
     OPEN_GATE_SWITCH_PIN, open_gate_switch_handler, debounce_time=500
 )
 
-gate_countdown_timer = Timer(0)
-gate_1_close_timer = Timer(1)
-gate_2_close_timer = Timer(2)
-lamp_timer = Timer(3)
+# Every timer runs on one software wheel, which only uses hardware Timer(0)
+wheel = TimerWheel(Timer(0), tick_ms=TICK_PERIOD)
+gate_countdown_timer = wheel.timer()
+gate_1_close_timer = wheel.timer()
+gate_2_close_timer = wheel.timer()
+lamp_timer = wheel.timer()
+relay_timer = wheel.timer()
+sensor_timer = wheel.timer()
+
+travel = TravelLearner(
+    (GATE_1_TIME_TO_CLOSE - CLOSE_MARGIN, GATE_2_TIME_TO_CLOSE - CLOSE_MARGIN)
+)
+leaf_1 = Leaf(1, gate_1, gate_1_open_sensor, gate_1_close_timer, travel.close_time(0))
+leaf_2 = Leaf(2, gate_2, gate_2_open_sensor, gate_2_close_timer, travel.close_time(1))
+
+gates = GateMachine(
+    (leaf_1, leaf_2),
+    open_leaf=open_leaf,
+    close_leaf=close_leaf,
+    stop_leaf=stop_leaf,
+    arm_sensor=arm_open_sensor,
+    disarm_sensor=disarm_open_sensor,
+    start_close_timer=start_close_timer,
+    cancel_close_timer=cancel_close_timer,
+    restart_countdown=restart_countdown,
+    arm_break=arm_break_sensor,
+    disarm_break=disarm_break_sensor,
+    trace=trace_transition,
+)
 
 # A WLAN interface must be active to send()/recv() via ESP-NOW
 sta = network.WLAN(network.STA_IF)
@@ -376,22 +374,28 @@ sta.disconnect()  # ESP-NOW does not have to be connected to a network
 # Initialize and activate ESP-NOW
 e = espnow.ESPNow()
 e.active(True)
+encoder = Encoder(ROLE_GATE_CONTROLLER)
+message = Message()  # Reused for every received frame
 
 
 def recv_cb(e):
     while True:  # Read out all messages waiting in the buffer
         mac, msg = e.irecv(0)  # Don't wait if no messages left
         if mac is None:
-            verbose_print("No more messages.")
-            verbose_print(e.peers_table)
             return
-        verbose_print(mac, msg.hex())
-        if msg == b"\x01":
-            # If the message is 0x01, open the gate
+        if parse(msg, message) is None:
+            continue  # Empty or truncated frame
+        event_log.record(LOG_ESPNOW_RX, arg=message.opcode)
+        if message.opcode == OP_OPEN:
             open_gate_switch_handler()
+        elif message.opcode == OP_LOG_REQUEST:
+            send_event_log(mac, message.seq)
 
 
 lamp.off()
+relay_timer.init(mode=Timer.PERIODIC, period=TICK_PERIOD, callback=service_relays)
+sensor_timer.init(mode=Timer.PERIODIC, period=TICK_PERIOD, callback=sensors.sample)
+wheel.start()
 
 # Enable the ESP-NOW interrupt service
 e.irq(recv_cb)
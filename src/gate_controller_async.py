@@ -0,0 +1,446 @@
+"""
+asyncio version of the gate controller app.
+
+The gate behaves the same as in gate_controller.py, but no work is done inside interrupts or hardware timers.
+The input sampler and the ESP-NOW receiver only post events to a queue. A dispatcher task runs them through the
+transition table in lib/gate_fsm.py, and every delay (keep-open countdown, leaf close strokes, lamp blinking and
+relay edges) is a task that is cancelled instead of a Timer that is deinit()'ed.
+"""
+
+import asyncio  # type: ignore
+import network  # type: ignore
+import aioespnow  # type: ignore
+
+from lib.gate_control import Gate, RelaySequencer
+from lib.bounce import DebounceGroup
+from lib.gate_fsm import (
+    Leaf,
+    GateMachine,
+    EventQueue,
+    CLOSED,
+    OPENING,
+    CLOSING,
+    EV_OPEN_REQUEST,
+    EV_BREAK,
+    EV_OPEN_REACHED,
+    EV_CLOSE_REQUEST,
+    EV_CLOSE_DONE,
+)
+from lib.leaf_travel import TravelLearner, CLOSE_MARGIN
+from lib.gate_protocol import (
+    Message,
+    Encoder,
+    parse,
+    OP_OPEN,
+    OP_LOG_REQUEST,
+    OP_LOG_RECORDS,
+    ROLE_GATE_CONTROLLER,
+)
+from lib.event_log import (
+    EventLog,
+    LOG_BUTTON,
+    LOG_SYSTEM_ON,
+    LOG_OPEN_REACHED,
+    LOG_BREAK,
+    LOG_CLOSE_BLOCKED,
+    LOG_CLOSE_DONE,
+    LOG_TRANSITION,
+    LOG_ALL_CLOSED,
+    LOG_SYSTEM_OFF,
+    LOG_ESPNOW_RX,
+    LOG_COUNTDOWN,
+    RECORD_SIZE,
+)
+
+from machine import Pin  # type: ignore
+
+# Events are written to a binary ring instead of being printed, see lib/event_log.py.
+# Dump it from the REPL with event_log.dump(), or over ESP-NOW by sending OP_LOG_REQUEST.
+event_log = EventLog(capacity=256)
+
+# Log code of each gate_fsm event posted by the inputs
+EVENT_LOG_CODES = (LOG_BUTTON, LOG_BREAK, LOG_OPEN_REACHED)
+
+##################
+# PIN ASSIGNMENT #
+##################
+
+# Output pins
+LAMP_PIN = 32  # Pin that turns the lamp on/off
+K1_MOTOR_1 = 33  # Pin that turns Motor 1 on/off
+K2_MOTOR_1 = 25  # Pin that sets Motor 1 direction
+K4_MOTOR_2 = 26  # Pin that turns Motor 2 on/off
+K3_MOTOR_2 = 27  # Pin that sets Motor 2 direction
+# Input pins
+GATE_1_OPEN_SENSOR_PIN = 36  # Pin that reads if gate 1 is fully open
+GATE_2_OPEN_SENSOR_PIN = 39  # Pin that reads if gate 1 is fully closed
+BREAK_SENSOR_PIN = 34  # Pin that detects if something passes through the gate
+OPEN_GATE_SWITCH_PIN = 35  # Pin that opens the gate
+
+################
+# Timer Values #
+################
+
+KEEP_GATE_OPEN_TIME = 15000  # Default time to keep the gate open in ms
+# Hand-measured full close times (see utility/get_gate_close_time.py). The close is stretched
+# if the timed opening strokes show a leaf getting slower, but never made shorter (see lib/leaf_travel.py).
+GATE_1_TIME_TO_CLOSE = 11000  # Default time to close gate 1 in ms
+GATE_2_TIME_TO_CLOSE = 12300  # Default time to close gate 2 in ms
+LAMP_PERIOD = 500  # Default time to blink the lamp in ms
+SENSOR_PERIOD = 10  # Time between two samples of the inputs in ms
+SENSOR_SAMPLES = 2  # Consistent samples needed before an input changes
+GATE_1_STAGGER = 0  # Delay before gate 1 starts closing in ms, for overlapping leaves
+GATE_2_STAGGER = 0  # Delay before gate 2 starts opening in ms, for overlapping leaves
+
+##################
+# ESP-NOW Frames #
+##################
+
+# Frames are encoded with lib/gate_protocol.py
+LOG_RECORDS_PER_FRAME = 30  # 30 records of 8 bytes fit in one ESP-NOW frame
+
+#############
+# Variables #
+#############
+
+system_active = False
+lamp_blinking = False
+countdown_task = None
+
+event_flag = asyncio.ThreadSafeFlag()  # Set when an event is posted
+relay_flag = asyncio.Event()  # Set when new relay edges are scheduled
+lamp_flag = asyncio.Event()  # Set when the lamp starts blinking
+events = EventQueue(notify=event_flag.set)
+
+##########################
+# PIN Callback Functions #
+##########################
+
+
+def open_gate_switch_handler():
+    events.post(EV_OPEN_REQUEST)
+
+
+def gate_1_open_sensor_handler():
+    events.post(EV_OPEN_REACHED, 0)
+
+
+def gate_2_open_sensor_handler():
+    events.post(EV_OPEN_REACHED, 1)
+
+
+def break_sensor_handler():
+    events.post(EV_BREAK)
+
+
+#########
+# Tasks #
+#########
+
+
+async def dispatcher():
+    """
+    Runs every posted event through the transition table.
+    """
+    global system_active
+
+    while True:
+        await event_flag.wait()
+        item = events.get()
+        while item is not None:
+            leaf_index, event = item
+            if event < len(EVENT_LOG_CODES):
+                event_log.record(EVENT_LOG_CODES[event], leaf_index + 1 if leaf_index < 2 else 0)
+            if event == EV_OPEN_REACHED:
+                learn_open_stroke(gates.leaves[leaf_index])
+            if event == EV_OPEN_REQUEST and not system_active:
+                system_active = True
+                event_log.record(LOG_SYSTEM_ON)
+            if leaf_index == EventQueue.ALL_LEAVES:
+                gates.broadcast(event)
+            else:
+                gates.dispatch(gates.leaves[leaf_index], event)
+            update_system()
+            item = events.get()
+
+
+async def countdown():
+    """
+    Keeps the gates opened for KEEP_GATE_OPEN_TIME, then closes them.
+    """
+    while True:
+        await asyncio.sleep_ms(KEEP_GATE_OPEN_TIME)
+        if break_sensor.pin.value() == 0:
+            break
+        # Attempted to close gates but break sensor is active
+        event_log.record(LOG_CLOSE_BLOCKED)
+
+    gates.broadcast(EV_CLOSE_REQUEST)
+    update_system()
+
+
+async def close_stroke(leaf):
+    """
+    Stops a closing leaf once its close time has elapsed.
+    """
+    # The stroke starts once the relays have switched the motor on
+    await asyncio.sleep_ms(leaf.time_to_close + leaf.gate.lead_time(False))
+    event_log.record(LOG_CLOSE_DONE, leaf.number, leaf.gate.status)
+    leaf.close_timer = None
+    gates.dispatch(leaf, EV_CLOSE_DONE)
+    travel.close_finished(leaf.number - 1, leaf.time_to_close)
+    update_system()
+
+
+async def sensor_sampler():
+    """
+    Samples the debounced inputs, which post their events to the queue.
+    """
+    while True:
+        sensors.sample()
+        await asyncio.sleep_ms(SENSOR_PERIOD)
+
+
+async def relay_driver():
+    """
+    Applies the relay edges scheduled by the gates as they become due.
+    """
+    while True:
+        relay_flag.clear()  # Edges scheduled from here on are seen by this service() or set the flag again
+        wait = relays.service()
+        if wait < 0:
+            await relay_flag.wait()
+            continue
+        try:
+            # New edges may be due before the pending one, e.g. a reopen during a staggered close
+            await asyncio.wait_for_ms(relay_flag.wait(), wait)
+        except asyncio.TimeoutError:
+            pass  # The pending edge is due
+
+
+async def lamp_blinker():
+    """
+    Blinks the lamp while any leaf is moving.
+    """
+    while True:
+        if not lamp_blinking:
+            await lamp_flag.wait()
+            lamp_flag.clear()
+            continue
+        lamp.on() if lamp.value() == 0 else lamp.off()
+        await asyncio.sleep_ms(LAMP_PERIOD)
+
+
+async def espnow_listener():
+    """
+    Opens the gate on an ESP-NOW open command and answers event log requests.
+    """
+    async for mac, msg in e:
+        if parse(msg, message) is None:
+            continue  # Empty or truncated frame
+        event_log.record(LOG_ESPNOW_RX, arg=message.opcode)
+        if message.opcode == OP_OPEN:
+            open_gate_switch_handler()
+        elif message.opcode == OP_LOG_REQUEST:
+            await send_event_log(mac, message.seq)
+
+
+################
+# Leaf Actions #
+################
+
+
+def open_leaf(leaf):
+    # Only timed if the last full close ran to the end stop
+    travel.stroke_started(leaf.number - 1, leaf.gate.lead_time(True))
+    travel.motor_started(leaf.number - 1, True, leaf.gate.lead_time(True))
+    leaf.gate.move_ccw()
+    relay_flag.set()
+
+
+def close_leaf(leaf):
+    travel.motor_started(leaf.number - 1, False, leaf.gate.lead_time(False))
+    leaf.gate.move_cw()
+    relay_flag.set()
+
+
+def stop_leaf(leaf):
+    travel.motor_stopped(leaf.number - 1)
+    leaf.gate.stop_gate()
+    relay_flag.set()
+
+
+def arm_open_sensor(leaf):
+    leaf.open_sensor.enable_irq()
+
+
+def disarm_open_sensor(leaf):
+    leaf.open_sensor.disable_irq()
+
+
+def start_close_timer(leaf):
+    # Only the travel left from the estimated position, e.g. after the leaf was held open part way
+    leaf.time_to_close = travel.close_time(leaf.number - 1)
+    leaf.close_timer = asyncio.create_task(close_stroke(leaf))
+
+
+def cancel_close_timer(leaf):
+    if leaf.close_timer is not None:
+        leaf.close_timer.cancel()
+        leaf.close_timer = None
+
+
+def restart_countdown(leaf):
+    global countdown_task
+    event_log.record(LOG_COUNTDOWN)
+    if countdown_task is not None:
+        countdown_task.cancel()
+    countdown_task = asyncio.create_task(countdown())
+
+
+def arm_break_sensor(leaf):
+    break_sensor.enable_irq()
+
+
+def disarm_break_sensor(leaf):
+    break_sensor.disable_irq()
+
+
+####################
+# Global Functions #
+####################
+
+
+def learn_open_stroke(leaf):
+    """
+    Updates the travel estimate and the position of a leaf that reached its open sensor.
+    """
+    travel.stroke_finished(leaf.number - 1)
+
+
+async def send_event_log(mac, seq):
+    """
+    Sends the event log to a peer as OP_LOG_RECORDS frames, oldest records first.
+
+    Args:
+        mac (bytes): MAC address of the peer.
+        seq (int): Sequence number of the request, repeated in every reply frame.
+    """
+    try:
+        e.add_peer(mac)
+    except OSError:
+        pass  # Already a peer
+    data = memoryview(event_log.snapshot())
+    chunk = LOG_RECORDS_PER_FRAME * RECORD_SIZE
+    for index, start in enumerate(range(0, len(data), chunk)):
+        await e.asend(mac, encoder.encode(OP_LOG_RECORDS, index, data[start : start + chunk], seq=seq))
+
+
+def trace_transition(leaf, event):
+    event_log.record(LOG_TRANSITION, leaf.number, leaf.gate.status, event)
+
+
+def update_system():
+    """
+    Updates the lamp from the leaf states and deactivates the system once both leaves are closed.
+    """
+    global lamp_blinking
+
+    if gates.any_in(OPENING) or gates.any_in(CLOSING):
+        # Blink the lamp while any leaf is moving
+        if not lamp_blinking:
+            lamp_blinking = True
+            lamp.value(0)
+            lamp_flag.set()
+    elif gates.all_in(CLOSED):
+        if system_active:
+            event_log.record(LOG_ALL_CLOSED)
+            deactivate_system()
+    else:
+        # Leaves are standing open, keep the lamp on
+        lamp_blinking = False
+        lamp.on()
+
+
+def deactivate_system():
+    global system_active, lamp_blinking, countdown_task
+    system_active = False
+    event_log.record(LOG_SYSTEM_OFF)
+
+    # Disable IRQs
+    gate_1_open_sensor.disable_irq()
+    gate_2_open_sensor.disable_irq()
+    break_sensor.disable_irq()
+
+    if countdown_task is not None:
+        countdown_task.cancel()
+        countdown_task = None
+    cancel_close_timer(leaf_1)
+    cancel_close_timer(leaf_2)
+
+    lamp_blinking = False
+    lamp.value(0)  # Turn off the lamp
+
+    travel.save()  # The gate is idle, store what was learned
+
+
+relays = RelaySequencer()
+gate_1 = Gate(K1_MOTOR_1, K2_MOTOR_1, relays, close_delay=GATE_1_STAGGER)
+gate_2 = Gate(K4_MOTOR_2, K3_MOTOR_2, relays, open_delay=GATE_2_STAGGER)
+lamp = Pin(LAMP_PIN, Pin.OUT)
+
+# All inputs are sampled together from one periodic tick
+sensors = DebounceGroup(threshold=SENSOR_SAMPLES)
+gate_1_open_sensor = sensors.add(
+    GATE_1_OPEN_SENSOR_PIN, gate_1_open_sensor_handler, debounce_time=3000
+)
+gate_2_open_sensor = sensors.add(
+    GATE_2_OPEN_SENSOR_PIN, gate_2_open_sensor_handler, debounce_time=3000
+)
+break_sensor = sensors.add(BREAK_SENSOR_PIN, break_sensor_handler, debounce_time=800)
+open_gate_switch = sensors.add(
+    OPEN_GATE_SWITCH_PIN, open_gate_switch_handler, debounce_time=500
+)
+
+travel = TravelLearner(
+    (GATE_1_TIME_TO_CLOSE - CLOSE_MARGIN, GATE_2_TIME_TO_CLOSE - CLOSE_MARGIN)
+)
+leaf_1 = Leaf(1, gate_1, gate_1_open_sensor, None, travel.close_time(0))
+leaf_2 = Leaf(2, gate_2, gate_2_open_sensor, None, travel.close_time(1))
+
+gates = GateMachine(
+    (leaf_1, leaf_2),
+    open_leaf=open_leaf,
+    close_leaf=close_leaf,
+    stop_leaf=stop_leaf,
+    arm_sensor=arm_open_sensor,
+    disarm_sensor=disarm_open_sensor,
+    start_close_timer=start_close_timer,
+    cancel_close_timer=cancel_close_timer,
+    restart_countdown=restart_countdown,
+    arm_break=arm_break_sensor,
+    disarm_break=disarm_break_sensor,
+    trace=trace_transition,
+)
+
+# A WLAN interface must be active to send()/recv() via ESP-NOW
+sta = network.WLAN(network.STA_IF)
+sta.active(True)
+sta.disconnect()  # ESP-NOW does not have to be connected to a network
+# Initialize and activate ESP-NOW
+e = aioespnow.AIOESPNow()
+e.active(True)
+encoder = Encoder(ROLE_GATE_CONTROLLER)
+message = Message()  # Reused for every received frame
+
+
+async def main():
+    lamp.off()
+    asyncio.create_task(sensor_sampler())
+    asyncio.create_task(relay_driver())
+    asyncio.create_task(lamp_blinker())
+    asyncio.create_task(espnow_listener())
+    await dispatcher()
+
+
+asyncio.run(main())
@@ -10,8 +10,21 @@ Author: Allan Bernard Chan
 from machine import I2C
 import time
 from rfid_reader import RFIDReader
-from display_manager import DisplayManager
-from espnow_handler import ESPNowHandler
+from display_manager import DisplayManager, FAST_MODE
+from espnow_handler import ESPNowHandler, RequestClient
+from decision_cache import DecisionCache
+from bloom_filter import BloomFilter
+from gate_protocol import (
+    OP_OPEN,
+    OP_CACHE_INVALIDATE,
+    OP_BLOOM_REQUEST,
+    OP_BLOOM_CHUNK,
+    OP_BLOOM_UPDATE,
+    OP_INSIDE_REQUEST,
+    OP_INSIDE_GRANTED,
+    OP_INSIDE_DENIED,
+    ROLE_INSIDE_READER,
+)
 
 RUNNER_MAC = b'\x1c\x69\x20\xce\xfa\x24'
 GATE_CONTROLLER_MAC = b'\xc8\x2e\x18\x51\xc8\x5c'
@@ -19,37 +32,126 @@ GATE_CONTROLLER_MAC = b'\xc8\x2e\x18\x51\xc8\x5c'
 # Pins
 CS = 27
 RST = 25
-i2c = I2C(0)
+i2c = I2C(0, freq=FAST_MODE)
 
 rfid = RFIDReader(cs_pin=CS, rst_pin=RST)
 oled = DisplayManager(i2c)
-esp = ESPNowHandler()
+# The fixed screens are rendered once, the results large enough to be read from a car
+oled.prerender("idle", ["Please scan", "your card."])
+oled.prerender("granted", ["Access", "granted"], scale=2, center=True)
+oled.prerender("denied", ["Access", "denied"], scale=2, center=True)
+oled.prerender("no_reply", ["No response from", "Admin Board.", "Try again."])
+esp = ESPNowHandler(rxbuf=8192)  # Room for the allowlist filter chunks
 esp.add_peer(RUNNER_MAC)
 esp.add_peer(GATE_CONTROLLER_MAC)
 
+REPLY_TIMEOUT = 3000  # Time in ms the admin board has to answer a scan
+RESULT_HOLD = 5000  # Time in ms a scan result stays on the display
+REPEAT_GUARD = 5000  # Time in ms a card left on the reader is not scanned again
+SCAN_PRIORITY = 1  # Screens of a scan replace any other screen at once
+MAX_BACKGROUND_CHECKS = 8  # Cached scans whose admin reply is still awaited
+
+# Recent decisions, so a card seen lately opens the gate without the admin round trip
+cache = DecisionCache(size=32)
+background = {}  # Sequence number -> UID of the scans answered from the cache
+
+# Allowlist filter from the admin board: lets known cards in when the admin board can not be
+# reached. Only used then, a copy that missed an update must not turn valid cards away
+BLOOM_FILE = "bloom.bin"
+allowlist = BloomFilter(4096)  # Same size as BLOOM_SIZE on the admin board
+allowlist_ready = allowlist.load(BLOOM_FILE)
+received_chunks = bytearray(allowlist.chunk_count)  # Chunks received since boot
+
+def on_frame(mac, message):
+    """
+    Handles frames that are not the reply being waited for.
+    """
+    global allowlist_ready
+    if message.opcode in (OP_BLOOM_CHUNK, OP_BLOOM_UPDATE):
+        payload = message.payload
+        index, count = payload[0], payload[1]
+        if count == allowlist.chunk_count and index < count:
+            allowlist.write_chunk(index, payload[2:])
+            received_chunks[index] = 1
+            if not allowlist_ready and all(received_chunks):
+                allowlist_ready = True
+    elif message.opcode == OP_CACHE_INVALIDATE:
+        cache.invalidate(message.payload)
+    elif message.opcode in (OP_INSIDE_GRANTED, OP_INSIDE_DENIED):
+        uid = background.pop(message.seq, None)
+        if uid is not None:
+            # Admin reply to a scan answered from the cache, keep the cache up to date
+            cache.put(uid, message.opcode == OP_INSIDE_GRANTED)
+
+client = RequestClient(esp, ROLE_INSIDE_READER, on_frame=on_frame)
+client.send(RUNNER_MAC, OP_BLOOM_REQUEST)  # Get the current filter, the chunks arrive through on_frame
+
+def check_card(uid):
+    """
+    Returns the reply opcode for a card, or None if the admin board did not answer.
+    """
+    client.poll()  # Apply invalidations that arrived while waiting for a card
+    granted = cache.get(uid)
+    if granted is not None:
+        # Answer now, the admin still checks the card and its reply refreshes the cache
+        if len(background) >= MAX_BACKGROUND_CHECKS:
+            background.clear()
+        background[client.send(RUNNER_MAC, OP_INSIDE_REQUEST, uid)] = uid
+        return OP_INSIDE_GRANTED if granted else OP_INSIDE_DENIED
+
+    # Returns as soon as the answer to this scan arrives, late answers to older scans are dropped
+    reply = client.request(
+        RUNNER_MAC,
+        OP_INSIDE_REQUEST,
+        uid,
+        expect=(OP_INSIDE_GRANTED, OP_INSIDE_DENIED),
+        timeout_ms=REPLY_TIMEOUT,
+    )
+    if reply is None:
+        # Admin board unreachable, fall back on the allowlist filter
+        if allowlist_ready and allowlist.might_contain(uid):
+            return OP_INSIDE_GRANTED
+        return None
+    if reply.opcode in (OP_INSIDE_GRANTED, OP_INSIDE_DENIED):
+        cache.put(uid, reply.opcode == OP_INSIDE_GRANTED)
+    return reply.opcode
+
+def idle():
+    """
+    Runs between two card probes.
+    """
+    client.poll()
+    oled.service()
+
 def main():
+    oled.set_idle("idle")
+    last_card = None
+    last_time = 0
     while True:
-        oled.show_lines(["Please scan", "your card."])
-        card_id = rfid.wait_for_card()
-        oled.show_lines(["Scanned:", card_id, "Checking..."])
+        card_id = rfid.wait_for_card(idle=idle)
+        now = time.ticks_ms()
+        if card_id == last_card and time.ticks_diff(now, last_time) < REPEAT_GUARD:
+            continue  # Same card still on the reader
+        last_card, last_time = card_id, now
+        oled.post(["Scanned:", card_id, "Checking..."], hold_ms=REPLY_TIMEOUT, priority=SCAN_PRIORITY)
 
-        # Send ID prefixed with 0xA0
         raw_bytes = bytes.fromhex(card_id[2:])
-        esp.send(RUNNER_MAC, b'\xa1' + raw_bytes)
-        time.sleep(5)  # Allow time for display update
-
-        mac, response = esp.recv()
-        print(f"[INSIDE READER] Received from {mac}: {response}")
-    
-        if response == b'\xa2': 
-            oled.show_lines(["Access granted"])
-            esp.send(GATE_CONTROLLER_MAC, b'\x01')
-        elif response == b'\xa3':
-            oled.show_lines(["Access denied"])
-        elif mac is None and response is None:
-            oled.show_lines(["No response from", "Admin Board.", "Try again."])
+        opcode = check_card(raw_bytes)
+        print(f"[INSIDE READER] Reply: {opcode}")
+
+        if opcode == OP_INSIDE_GRANTED:
+            client.send(GATE_CONTROLLER_MAC, OP_OPEN)  # Open first, the display can wait
+            screen = "granted"
+        elif opcode == OP_INSIDE_DENIED:
+            screen = "denied"
+        elif opcode is None:
+            screen = "no_reply"
         else:
-            oled.show_lines(["Unexpected response", "from Admin Board."])
-        time.sleep(5)  # Allow time for display update
+            screen = ["Unexpected response", "from Admin Board."]
+        # Stays up while the next card is awaited, a new scan replaces it
+        oled.post(screen, hold_ms=RESULT_HOLD, priority=SCAN_PRIORITY)
+        client.poll()
+        if allowlist_ready and allowlist.dirty:
+            allowlist.save(BLOOM_FILE)  # Between scans, so the flash write delays nobody
 
 main()
@@ -9,27 +9,38 @@ Author: Allan Bernard Chan
 
 import espnow  # type: ignore
 import network  # type: ignore
-
-def add_peer(e_obj: espnow.ESPNow ,mac: bytearray) -> None:
-    """
-    Adds a peer to the ESP-NOW peer list.
-
-    Args:
-        e_obj (espnow.ESPNow): ESP-NOW object to add the peer to.
-        mac (bytes): MAC address of the peer.
-    """
-    try:
-        e_obj.add_peer(mac)
-    except Exception as ex:
-        print(f"[ESPNow] Failed to add peer {mac}. It may already exist. Exception: {ex}")
+from gate_protocol import (
+    Message,
+    parse,
+    OP_LOG_RECORDS,
+    OP_BLOOM_CHUNK,
+    OP_INSIDE_GRANTED,
+    OP_INSIDE_DENIED,
+    OP_OUTSIDE_GRANTED,
+    OP_OUTSIDE_DENIED,
+)
+from espnow_relay import ForwardQueue, Relay, RouteTable, PeerCache
 
 # Update with real MACs
 ADMIN_MAC = b'\x1c\x69\x20\xce\xf8\xe4'
-READER_MACS = {
-    b'\x84\x0d\x8e\xae\x59\x66',
-    b'\x08\xa6\xf7\xbc\xe5\x48',
-    b'\xc8\x2e\x18\x51\x7e\xe8',
-}  # Inside, outside reader MACs, and test board MAC
+# Readers are not listed: any other board that sends a frame is learned as a reader
+
+FORWARD_QUEUE_SIZE = 16  # Frames waiting to be sent, the oldest is dropped when full
+ROUTE_TABLE_SIZE = 32  # Requests whose sender is remembered
+REPLY_TIMEOUT = 10000  # Time in ms the admin has to reply before a request is forgotten
+MAX_READERS = 16  # Learned reader peers, ESP-NOW holds at most 20 peers in total
+READER_IDLE_TIME = 600000  # Readers not heard from for 10 minutes are removed as peers
+# Admin frames that answer a request and carry its sequence number. Anything else the admin
+# sends, e.g. OP_CACHE_INVALIDATE, uses its own numbers and must reach every reader
+REPLY_OPCODES = (
+    OP_INSIDE_GRANTED,
+    OP_INSIDE_DENIED,
+    OP_OUTSIDE_GRANTED,
+    OP_OUTSIDE_DENIED,
+    OP_LOG_RECORDS,
+    OP_BLOOM_CHUNK,
+)
+VERBOSE = False  # Print every relayed frame. Printing is slow, leave off unless debugging
 
 # A WLAN interface must be active to send()/recv() via ESP-NOW
 sta = network.WLAN(network.STA_IF)
@@ -40,28 +51,44 @@ sta.disconnect()  # Ensure no active connections
 e = espnow.ESPNow()
 e.active(True)
 
-# Add peers to the ESP-NOW instance
-add_peer(e, ADMIN_MAC)  # Add admin peer
-for mac in READER_MACS:
-    add_peer(e, mac)  # Add reader peers
+routes = RouteTable(ROUTE_TABLE_SIZE, REPLY_TIMEOUT)
+readers = PeerCache(e, MAX_READERS, READER_IDLE_TIME)
+# The admin is always a peer, readers are added when they are first heard from
+readers.pin(ADMIN_MAC)
+
+message = Message()  # Reused for every received frame
+TO_ADMIN = (ADMIN_MAC,)
+NOWHERE = ()
+
+def route(mac, msg):
+    """
+    Returns the MACs a received frame is forwarded to.
+
+    Frames are relayed unchanged, so the sender's sequence number and role reach the receiver.
+    """
+    if parse(msg, message) is None:
+        if VERBOSE:
+            print(f"[RUNNER] Dropping malformed frame from {mac}")
+        return NOWHERE
+    if VERBOSE:
+        print(f"[RUNNER] Relay: {mac} -> op {message.opcode:#04x} seq {message.seq} role {message.role}")
 
-def recv_cb(e):
-    while True:  # Read out all messages waiting in the buffer
-        mac, msg = e.irecv(0)  # Don't wait if no messages left
-        if mac is None or msg is None:
-            continue
-        print(f"[RUNNER] Relay: {mac} -> {msg}")
+    if mac == ADMIN_MAC:
+        if message.version and message.opcode in REPLY_OPCODES:
+            requesters = routes.lookup(message.seq)
+            if requesters:
+                return requesters  # Reply, only the reader that asked gets it
+        # Frames the admin sends on its own, and old frames without a sequence number,
+        # go to every reader that is still around, even if their number matches a request
+        return readers.macs()
 
-        if mac in READER_MACS:  # If message from a reader
-            print(f"[RUNNER] Forwarding to admin: {msg}")
-            e.send(ADMIN_MAC, msg)  # Forward messages from readers to admin
+    # Anything else comes from a reader and goes to the admin
+    readers.seen(mac)
+    if message.version:
+        routes.learn(message.seq, mac)
+    return TO_ADMIN
 
-        elif mac == ADMIN_MAC:  # If message from admin
-            # Forward messages from admin to all readers
-            print(f"[RUNNER] Forwarding to readers: {msg}")
-            # Iterate through all reader MACs and send the message
-            for reader_mac in READER_MACS:
-                e.send(reader_mac, msg)
+relay = Relay(e, route, ForwardQueue(FORWARD_QUEUE_SIZE))
 
 # Enable the ESP-NOW interrupt service
-e.irq(recv_cb)
+e.irq(relay.on_recv)
@@ -0,0 +1,26 @@
+"""
+Builds the card index of the admin board from a text file with one card UID per line,
+as printed by the readers (e.g. 0x1A2B3C4D5E). Lines starting with # are ignored.
+Runs on the host or on the board.
+
+Usage:
+    python utility/build_card_index.py cards.txt cards.bin
+"""
+
+import sys
+
+sys.path.append("lib")
+from card_index import build
+
+
+def read_uids(path):
+    with open(path) as f:
+        for line in f:
+            line = line.split("#")[0].strip()
+            if line:
+                yield bytes.fromhex(line[2:] if line.lower().startswith("0x") else line)
+
+
+if __name__ == "__main__":
+    source, target = sys.argv[1], sys.argv[2]
+    print(f"Wrote {build(target, read_uids(source))} cards to {target}")
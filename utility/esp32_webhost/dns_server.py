@@ -1,20 +1,123 @@
+"""
+dns_server.py
+
+Captive-portal DNS responder: every A query is answered with the address of
+the access point, other query types are refused.
+
+The answer record is built once; per packet only the header and question are
+copied into a preallocated buffer. The socket is non-blocking and served from
+a task on the same asyncio loop as the HTTP server, so no thread is needed.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import asyncio  # type: ignore
 import socket
 
-def start_dns_server(ip='192.168.4.1'):
-    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    udp.bind(('0.0.0.0', 53))
-    print("DNS server started")
-
-    while True:
-        try:
-            data, addr = udp.recvfrom(512)
-            request_id = data[0:2]
-            response = request_id + b'\x81\x80\x00\x01\x00\x01\x00\x00\x00\x00'
-            query = data[12:]
-            response += query
-            response += b'\xc0\x0c\x00\x01\x00\x01\x00\x00\x00\x3c\x00\x04'
-            response += bytes(map(int, ip.split('.')))
-            udp.sendto(response, addr)
-        except Exception as e:
-            print("DNS error:", e)
+DNS_PORT = 53
+POLL_PERIOD = 10  # Time in ms between two reads of the socket when it is empty
+TTL = 60  # Time in s phones may cache the answer
+MAX_PACKET = 512
+
+QTYPE_A = 1
+QCLASS_IN = 1
+RCODE_REFUSED = 5
+
+
+class DNSServer:
+    """
+    Answers A queries with one address.
+
+    Attributes:
+        answer (bytes): Answer record, the name is a pointer to the question.
+        answered (int): Number of A queries answered.
+        refused (int): Number of queries refused.
+    """
+    def __init__(self, ip='192.168.4.1', ttl=TTL):
+        self.answer = bytes((
+            0xC0, 0x0C,  # Name: pointer to the question name
+            0x00, QTYPE_A,
+            0x00, QCLASS_IN,
+            (ttl >> 24) & 0xFF, (ttl >> 16) & 0xFF, (ttl >> 8) & 0xFF, ttl & 0xFF,
+            0x00, 0x04,  # Address length
+        )) + bytes(int(part) for part in ip.split('.'))
+        self.answered = 0
+        self.refused = 0
+        self._response = bytearray(MAX_PACKET + len(self.answer))
+        self._view = memoryview(self._response)
+        self.sock = None
+
+    def _question_end(self, data):
+        # Offset after QTYPE and QCLASS of the single question, or -1 if the query is malformed
+        if len(data) < 12 or data[2] & 0xF8 or data[4] or data[5] != 1:
+            return -1  # A response, an opcode other than QUERY, or not exactly one question
+        i = 12
+        n = len(data)
+        while i < n:
+            length = data[i]
+            if length == 0:
+                i += 5
+                return i if i <= n else -1
+            if length & 0xC0:
+                return -1  # Compression is not used in questions
+            i += length + 1
+        return -1
+
+    def respond(self, data):
+        """
+        Builds the response to a query.
+
+        Args:
+            data (bytes): The query packet.
+        Returns:
+            memoryview: Response, valid until the next call. None if the query is not answered.
+        """
+        end = self._question_end(data)
+        if end < 0:
+            return None
+        qtype = (data[end - 4] << 8) | data[end - 3]
+        qclass = (data[end - 2] << 8) | data[end - 1]
+        out = self._response
+        out[0:end] = data[:end]  # ID, flags, counts and question
+        out[2] = 0x80 | (data[2] & 0x01)  # QR, keep RD
+        out[4:12] = b'\x00\x01\x00\x00\x00\x00\x00\x00'
+        if qtype == QTYPE_A and qclass == QCLASS_IN:
+            out[3] = 0x80  # RA, no error
+            out[7] = 1  # One answer
+            out[end:end + len(self.answer)] = self.answer
+            self.answered += 1
+            return self._view[:end + len(self.answer)]
+        out[3] = 0x80 | RCODE_REFUSED
+        self.refused += 1
+        return self._view[:end]
+
+    def start(self, host='0.0.0.0', port=DNS_PORT):
+        """
+        Opens the socket.
+        """
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+    async def run(self):
+        """
+        Answers queries forever, as an asyncio task.
+        """
+        if self.sock is None:
+            self.start()
+        print("DNS server started")
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(MAX_PACKET)
+            except OSError:
+                await asyncio.sleep_ms(POLL_PERIOD)  # Nothing waiting
+                continue
+            response = self.respond(data)
+            if response is not None:
+                try:
+                    self.sock.sendto(response, addr)
+                except OSError as e:
+                    print(f"[DNS] Failed to answer {addr}: {e}")
+            await asyncio.sleep_ms(0)  # Let the HTTP tasks run during a burst of queries
@@ -0,0 +1,184 @@
+"""
+http_server.py
+
+Small asyncio HTTP/1.1 server for the web button. Every client connection is
+its own task, so several phones are served at the same time, and connections
+are kept alive between requests, so a button press is a single round trip on
+an open socket.
+
+Handlers are registered per path with route() and return
+(status, content_type, body). Requests to unknown paths go to the default
+handler, which for a captive portal is the page itself.
+
+Author: Allan Bernard Chan
+Date: October 2026
+"""
+
+import asyncio  # type: ignore
+
+KEEP_ALIVE_TIMEOUT = 30  # Time in s an idle connection is kept open
+MAX_HEADERS = 32  # Header lines read per request, the rest of the request is refused
+MAX_BODY = 1024  # Largest request body read, in bytes
+
+REASONS = {
+    200: b"OK",
+    400: b"Bad Request",
+    404: b"Not Found",
+    405: b"Method Not Allowed",
+    413: b"Payload Too Large",
+    500: b"Internal Server Error",
+}
+
+
+class Request:
+    """
+    A parsed request.
+
+    Attributes:
+        method (str): Request method, e.g. "GET".
+        path (str): Path without the query string.
+        query (str): Query string, "" if there is none.
+        version (bytes): Protocol version, e.g. b"HTTP/1.1".
+        headers (dict): Header values by lower case name, as bytes.
+        body (bytes): Request body.
+    """
+    def __init__(self, method, path, query, version, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+
+class HTTPServer:
+    """
+    Routes requests to handlers.
+
+    Attributes:
+        routes (dict): Handler by path.
+        default (function): Handler for the paths without a route, None to answer 404.
+    """
+    def __init__(self, default=None):
+        self.routes = {}
+        self.default = default
+        self.server = None
+
+    def route(self, path, handler=None, methods=("GET",)):
+        """
+        Registers handler(request) for a path. Can be used as a decorator.
+
+        Args:
+            path (str): Path to serve.
+            handler (function): Returns (status, content_type, body).
+            methods (tuple): Methods accepted, others are answered with 405.
+        """
+        def register(handler):
+            self.routes[path] = (handler, methods)
+            return handler
+        if handler is None:
+            return register
+        return register(handler)
+
+    async def start(self, host="0.0.0.0", port=80, backlog=5):
+        """
+        Starts listening. The connections are served by tasks of the running loop.
+        """
+        self.server = await asyncio.start_server(self._serve, host, port, backlog=backlog)
+        return self.server
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if request is None:
+                    break  # Connection closed by the client
+                if isinstance(request, int):
+                    await self._respond(writer, request, b"text/plain", REASONS[request], False)
+                    break
+                keep_alive = self._keep_alive(request)
+                status, content_type, body = self._dispatch(request)
+                await self._respond(writer, status, content_type, body, keep_alive)
+                if not keep_alive:
+                    break
+        except EOFError:
+            pass  # Closed in the middle of a body
+        except OSError as e:
+            print(f"[HTTP] Connection error: {e}")
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def _read_request(self, reader):
+        # Returns a Request, None at the end of the stream, or the status of a bad request
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.split()
+        if len(parts) != 3 or not parts[2].startswith(b"HTTP/"):
+            return 400
+        headers = {}
+        for _ in range(MAX_HEADERS):
+            line = await reader.readline()
+            if not line:
+                return None
+            if line == b"\r\n" or line == b"\n":
+                break
+            name, sep, value = line.partition(b":")
+            if not sep:
+                return 400
+            headers[name.strip().lower()] = value.strip()
+        else:
+            return 400
+        body = b""
+        length = headers.get(b"content-length")
+        if length:
+            try:
+                length = int(length)
+            except ValueError:
+                return 400
+            if length > MAX_BODY:
+                return 413
+            body = await reader.readexactly(length)
+        path, _, query = parts[1].decode().partition("?")
+        return Request(parts[0].decode(), path, query, parts[2], headers, body)
+
+    def _keep_alive(self, request):
+        connection = request.headers.get(b"connection", b"").lower()
+        if request.version == b"HTTP/1.0":
+            return connection == b"keep-alive"
+        return connection != b"close"
+
+    def _dispatch(self, request):
+        route = self.routes.get(request.path)
+        if route is None:
+            if self.default is None:
+                return 404, b"text/plain", REASONS[404]
+            handler = self.default
+        elif request.method not in route[1]:
+            return 405, b"text/plain", REASONS[405]
+        else:
+            handler = route[0]
+        try:
+            return handler(request)
+        except Exception as e:
+            print(f"[HTTP] Handler for {request.path} failed: {e}")
+            return 500, b"text/plain", REASONS[500]
+
+    async def _respond(self, writer, status, content_type, body, keep_alive):
+        if isinstance(body, str):
+            body = body.encode()
+        if isinstance(content_type, str):
+            content_type = content_type.encode()
+        writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n" % (
+            status,
+            REASONS.get(status, b""),
+            content_type,
+            len(body),
+            b"keep-alive" if keep_alive else b"close",
+        ))
+        writer.write(body)
+        await writer.drain()
@@ -0,0 +1,35 @@
+"""
+Requests the binary event log of the gate controller over ESP-NOW and prints it.
+Run on any ESP32 within range of the gate controller.
+"""
+
+import network  # type: ignore
+import espnow  # type: ignore
+
+from event_log import decode
+from gate_protocol import Encoder, parse, OP_LOG_REQUEST, OP_LOG_RECORDS, ROLE_TOOL
+
+GATE_CONTROLLER_MAC = b"\xc8\x2e\x18\x51\xc8\x5c"
+
+sta = network.WLAN(network.STA_IF)
+sta.active(True)
+sta.disconnect()
+
+e = espnow.ESPNow()
+e.active(True)
+e.add_peer(GATE_CONTROLLER_MAC)
+encoder = Encoder(ROLE_TOOL)
+e.send(GATE_CONTROLLER_MAC, encoder.encode(OP_LOG_REQUEST))
+
+frames = {}
+while True:
+    mac, msg = e.recv(1000)
+    if mac is None:
+        break
+    reply = parse(msg) if mac == GATE_CONTROLLER_MAC else None
+    if reply is not None and reply.opcode == OP_LOG_RECORDS and reply.seq == encoder.seq:
+        frames[reply.payload[0]] = bytes(reply.payload[1:])
+
+for index in sorted(frames):
+    for line in decode(frames[index]):
+        print(line)